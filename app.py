@@ -13,17 +13,25 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 
-from modules.data_loader import load_all_data
-from modules.translation_engine import create_translation_dicts
-from modules.display_formatter import format_dataframe_for_display, to_html_table
-from modules.diff_engine import compare_dataframes
+from modules.data_loader import HERO_MASTER_TTL_SECONDS, refresh_hero_master
+from modules.pipeline import (static_format_stage, time_format_stage, filter_stage, render_stage,
+                             table_payload_stage, build_comparison, comparison_cache_key, comparison_pair_key,
+                             load_window)
+from modules.calendar_table import render_calendar_table
+from modules.display_formatter import (TABLE_PAGE_SIZES, page_bounds, format_dataframe_for_display,
+                                       add_template_hero_columns)
+from modules.frame_registry import registry, session_acquire
+from modules.snapshot_catalog import (default_diff_folder, index_snapshot, loaded_snapshots, mark_loaded,
+                                      release_history, snapshot_info)
+from modules.timeline import build_timeline, event_lineage, timeline_key
+from modules.diff_engine import changed_group_labels
+from modules.snapshot_watcher import ensure_watcher_started
 from modules.forum_post_creator import render_forum_post_creator
 from modules.discord_post_creator import render_discord_post_creator
 
 DATA_DIR = Path("data")
 CONFIG_FILE = DATA_DIR / "config.json"
 RULES_FILE = DATA_DIR / "type_mapping_rules.json"
-EVENT_HISTORY_FILE = DATA_DIR / ".history_event.log"
 HERO_GEN_SCRIPT_PATH = "D:/PyScript/EMP Extract/FLAT-EXTRACT/All Hero/generate_hero_dataset_gemini_v1.9.py"
 
 def inject_custom_css():
@@ -52,41 +60,61 @@ def load_json_file(filepath, default_data={}):
 def save_json_file(filepath, data):
     with open(filepath, "w", encoding="utf-8") as f: json.dump(data, f, indent=2, ensure_ascii=False)
 
-def load_history(filepath):
-    if not filepath.exists(): return []
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.read().splitlines()
-        return list(dict.fromkeys(filter(None, lines)))
+def snapshot_caption(folder):
+    """サイドバー用のスナップショット概要（カタログに登録済みの場合のみ）。"""
+    info = snapshot_info(folder)
+    if not info or info['rows'] is None:
+        return None
+    return f"{info['rows']} rows, start {info['min_start_date']} – {info['max_start_date']}"
 
-def save_to_history(filepath, new_entry):
-    history = load_history(filepath)
-    if new_entry in history: 
-        history.remove(new_entry)
-    if new_entry:
-        history.insert(0, new_entry)
-    with open(filepath, "w", encoding="utf-8") as f: 
-        f.write("\n".join(history))
+def render_event_history(filtered_df, latest_folder, rules, en_map, ja_map, timezone):
+    """
+    表示中のイベント1件の履歴（読み込み済みスナップショットを古い順に、最新フォルダまで）。
+    タイムラインは結果キャッシュに保存され、新しいスナップショットが増えても差分1回分で更新される。
+    """
+    events = filtered_df.dropna(subset=['unique_id']).drop_duplicates('unique_id')
+    if events.empty:
+        st.caption("No events with a unique_id in the selected range.")
+        return
+    names = dict(zip(events['unique_id'], events.get('Event Name', events['unique_id'])))
+    unique_id = st.selectbox("Event", list(names), format_func=lambda uid: f"{names[uid]} ({uid})",
+                             key="history_event")
+    folders = release_history(latest_folder)
+    if latest_folder not in folders:
+        folders.append(latest_folder)
+    st.caption(f"{len(folders)} snapshots: `{folders[0]}` … `{folders[-1]}`")
+    if not st.checkbox("Show history", key="show_event_history"):
+        return
+
+    # Keyed on the snapshots' content too, so a CSV re-exported into a folder is not served an old lineage
+    timeline = registry.get(('timeline', timeline_key(folders)), lambda: build_timeline(folders))
+    history = event_lineage(timeline, unique_id=unique_id)
+    if history.empty:
+        st.info("This event has no recorded changes.")
+        return
+    history_df = add_template_hero_columns(format_dataframe_for_display(history, rules, en_map, ja_map, timezone))
+    for col in ['Start Time', 'End Time']:
+        history_df[col] = history_df[col].dt.strftime("%Y-%m-%d %H:%M")
+    history_df['_changed_columns'] = changed_group_labels(history_df['_changed_columns'])
+    columns = ['folder', '_diff_status', '_changed_columns', 'Start Time', 'End Time', 'original_start_date_iso',
+               'Featured Heroes (EN) Template', 'Non-Featured Heroes (EN) Template', 'diff_id']
+    st.dataframe(history_df[[col for col in columns if col in history_df.columns]], hide_index=True,
+                 use_container_width=True)
 
-@st.cache_data
-def load_and_process_data(latest_folder, diff_folder):
+def load_and_process_data(latest_folder, diff_folder, window_start=None, window_end=None):
     """
     データの読み込み、差分比較、翻訳マップ作成までを一括で行う。
-    結果はStreamlitによってキャッシュされる。
+    window_start/window_end を指定すると、その期間（前後マージン込み）に重なるイベントだけを読み込む。
+    結果はプロセス内のレジストリで全セッション共有（コピーなし）され、ディスク上にも保存されるため再起動後もすぐに表示できる。
+    返されるDataFrameは共有されているため、変更する場合は必ずコピーすること。
     """
     try:
-        data = load_all_data(latest_folder, diff_folder)
-        
-        comparison_df = None
-        if data['diff_df'] is not None:
-            comparison_df = compare_dataframes(data['main_df'], data['diff_df'])
-        else:
-            comparison_df = data['main_df'].copy()
-            comparison_df['_diff_status'] = 'unchanged'
-            comparison_df['_changed_columns'] = [[] for _ in range(len(comparison_df))]
-
-        en_map, ja_map = create_translation_dicts(data['hero_master_df'], data['g_sheet_df'])
-        
-        return comparison_df, en_map, ja_map
+        cache_key = comparison_cache_key(latest_folder, diff_folder, window_start, window_end)
+        st.session_state['comparison_key'] = ('comparison', cache_key)
+        st.session_state['comparison_pair_key'] = comparison_pair_key(latest_folder, diff_folder)
+        return session_acquire(
+            st.session_state, 'comparison', ('comparison', cache_key),
+            lambda: build_comparison(cache_key, latest_folder, diff_folder, window_start, window_end))
     except FileNotFoundError as e:
         st.error(f"ファイルが見つかりません: {e}")
         st.info("以下のことを確認してください:")
@@ -127,8 +155,8 @@ def debug_google_drive_data():
             else:
                 st.info("hero_master.csv file will be downloaded when data is loaded")
             
-            st.info("Note: The hero_master.csv file is automatically downloaded from Google Drive")
-            st.info("every time data is loaded, ensuring fresh data (updated every 6 hours).")
+            st.info("Note: When 'Load Data' is clicked, hero_master.csv is checked against Google Drive")
+            st.info(f"(at most every {HERO_MASTER_TTL_SECONDS // 60} minutes) and downloaded only if it changed.")
 
         except Exception as e:
             st.error("An error occurred while checking Google Drive integration.")
@@ -146,19 +174,33 @@ rules = load_json_file(RULES_FILE, [])
 st.sidebar.header("Select Data Sources")
 latest_folder = st.sidebar.text_input("① Latest Data (Required)", value=config.get("event_folder"))
 
-# Load history and create dropdown first
-event_history = load_history(EVENT_HISTORY_FILE)
+# Previously loaded snapshots from the catalog; defaults to the saved diff folder, else the release before the latest
+event_history = loaded_snapshots()
 diff_options = [h for h in event_history if h != latest_folder]
 if not diff_options:
     diff_folder = st.sidebar.selectbox("② Previous Data for Diff", ["No options"], disabled=True)
 else:
-    current_diff = config.get("diff_folder")
-    index = diff_options.index(current_diff) if current_diff in diff_options else 0
+    # Same default as the snapshot watcher warms
+    index = diff_options.index(default_diff_folder(latest_folder, config.get("diff_folder")))
     diff_folder = st.sidebar.selectbox("② Previous Data for Diff", diff_options, index=index)
+for folder in dict.fromkeys([latest_folder, diff_folder if diff_options else None]):
+    caption = snapshot_caption(folder) if folder else None
+    if caption:
+        st.sidebar.caption(f"`{folder}`: {caption}")
 
-# Load history after potential updates
 if st.sidebar.button("Load Data", key="load_data_button"):
-    save_to_history(EVENT_HISTORY_FILE, latest_folder)
+    # The only place the UI checks Drive for a new hero master; ordinary reruns use the local copy
+    refresh_hero_master()
+    mark_loaded(latest_folder)
+    load_folders = [latest_folder, diff_folder if diff_options else None]
+    for folder in load_folders:
+        try:
+            if folder:
+                index_snapshot(folder)
+        except Exception as e:
+            print(f"Warning: could not index snapshot {folder}: {e}")
+    # The event store is filled off the UI thread; until then the comparison is diffed in memory
+    ensure_watcher_started().store_in_background(load_folders)
     config['event_folder'] = latest_folder
     config['diff_folder'] = diff_folder
     save_json_file(CONFIG_FILE, config)
@@ -167,11 +209,22 @@ if st.sidebar.button("Load Data", key="load_data_button"):
 # JSON変換ツールへのリンク
 st.sidebar.markdown("---")
 st.sidebar.page_link("pages/_2_JSON_to_Template_Converter.py", label="🔄 JSON Template Converter", icon="🔄")
+
+# New snapshot folders are ingested and diffed in the background, so their first load is warm
+watcher_status = ensure_watcher_started().status()
+with st.sidebar.expander(f"New snapshots ({len(watcher_status)})", expanded=False):
+    if not watcher_status:
+        st.caption("No new snapshot folders detected.")
+    for entry in watcher_status:
+        detail = f" vs `{entry['diff_against']}`" if entry['diff_against'] else ""
+        st.markdown(f"`{entry['folder']}`{detail}: **{entry['state']}**")
+        if entry['rows'] is not None:
+            st.caption(f"{entry['rows']} rows, {entry['seconds'] or 0}s, {entry['updated']}")
+        if entry['error']:
+            st.caption(f"Error: {entry['error']}")
         
 if latest_folder:
     try:
-        comparison_df, en_map, ja_map = load_and_process_data(latest_folder, diff_folder)
-        
         st.header(f"Event Display: `{latest_folder}`")
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -189,30 +242,23 @@ if latest_folder:
         if timezone != config.get('timezone'): config['timezone'] = timezone; config_changed = True
         if config_changed: save_json_file(CONFIG_FILE, config)
 
-        display_df = format_dataframe_for_display(comparison_df, rules, en_map, ja_map, timezone)
+        # Only the months around the visible range and the post creators' range are loaded and diffed;
+        # moving the date filter inside them keeps the loaded comparison
+        window = load_window(config, st.session_state.get('load_window', (None, None)))
+        st.session_state['load_window'] = window
+        comparison_df, en_map, ja_map = load_and_process_data(latest_folder, diff_folder, *window)
 
-        # Get timezone from first valid datetime in Start Time column
-        valid_start_times = display_df['Start Time'].dropna()
-        if not valid_start_times.empty:
-            tz = valid_start_times.iloc[0].tz
-        else:
-            tz = 'UTC'
-        
-        start_dt_aware = pd.to_datetime(start_date_filter).tz_localize(tz)
-        end_dt_aware = (pd.to_datetime(end_date_filter) + pd.Timedelta(days=1, seconds=-1)).tz_localize(tz)
-        
-        # Filter only rows with valid datetime values
-        valid_mask = display_df['Start Time'].notna()
-        filtered_df = display_df[valid_mask & display_df['Start Time'].between(start_dt_aware, end_dt_aware)].copy()
+        # Staged pipeline: the format stages are keyed on the snapshot pair, load window, rules and timezone,
+        # never on the filter dates, so a timezone switch only redoes the time columns and a date range
+        # change inside the loaded months only re-slices the cached frame and re-renders
+        static_key, static_df = static_format_stage(
+            st.session_state['comparison_pair_key'], window, comparison_df, rules, en_map, ja_map, st.session_state)
+        display_key, display_df = time_format_stage(static_key, static_df, timezone, st.session_state)
+        filter_key, filtered_df = filter_stage(display_key, display_df, start_date_filter, end_date_filter)
         
         st.subheader("Filtered Event List")
         
         if not filtered_df.empty:
-            dt_format = "%Y-%m-%d %H:%M"
-            for col in ['Start Time', 'End Time']:
-                if col in filtered_df.columns and pd.api.types.is_datetime64_any_dtype(filtered_df[col]):
-                     filtered_df[col] = filtered_df[col].dt.strftime(dt_format)
-
             header_labels = {
                 "Icon": "Icon", "Display Type": "Type", "Start Time": "Start", "End Time": "End", "Duration": "Days",
                 "Featured Heroes (EN)": "Feat.(EN)", "Non-Featured Heroes (EN)": "Non-Feat.(EN)",
@@ -256,30 +302,44 @@ if latest_folder:
                     if selected_post_type == "Forum Post":
                         render_forum_post_creator(diff_df, en_map, ja_map, timezone)
                     elif selected_post_type == "Discord Post":
-                        render_discord_post_creator(diff_df, en_map, ja_map, timezone)
+                        render_discord_post_creator(diff_df, en_map, ja_map, timezone, display_df=display_df)
                 else:
                     st.info("No changes found to create posts.")
             else:
                 # Show normal table view
-                with st.expander("Customize Columns", expanded=False):
-                    if 'selected_cols' not in st.session_state:
-                        st.session_state.selected_cols = presets["Standard"]
-                    if st.session_state.get('current_preset') != preset_choice:
-                        st.session_state.selected_cols = presets[preset_choice]
-                        st.session_state.current_preset = preset_choice
+                table_mode = st.radio("Table", ["Paged", "Interactive"], horizontal=True, key="table_mode",
+                                      help="Interactive sends the rows once; sorting, scrolling and column "
+                                           "toggling then happen in the browser without reloading.")
+                if table_mode == "Interactive":
+                    # Columns are toggled inside the table; the preset only sets the initial selection
+                    st.session_state.selected_cols = presets[preset_choice]
+                    st.session_state.current_preset = preset_choice
+                else:
+                    with st.expander("Customize Columns", expanded=False):
+                        if 'selected_cols' not in st.session_state:
+                            st.session_state.selected_cols = presets["Standard"]
+                        if st.session_state.get('current_preset') != preset_choice:
+                            st.session_state.selected_cols = presets[preset_choice]
+                            st.session_state.current_preset = preset_choice
 
-                    selected_labels = st.multiselect(
-                        "Select columns to display:", 
-                        options=[header_labels.get(col, col) for col in ordered_all_cols],
-                        default=[header_labels.get(col, col) for col in st.session_state.selected_cols if col in header_labels],
-                    )
-                    st.session_state.selected_cols = [label_to_col_map[label] for label in selected_labels]
+                        selected_labels = st.multiselect(
+                            "Select columns to display:", 
+                            options=[header_labels.get(col, col) for col in ordered_all_cols],
+                            default=[header_labels.get(col, col) for col in st.session_state.selected_cols if col in header_labels],
+                        )
+                        st.session_state.selected_cols = [label_to_col_map[label] for label in selected_labels]
 
                 selected_user_cols = st.session_state.selected_cols
-                final_df = filtered_df.copy() 
+                export_df = filtered_df[selected_user_cols].copy()
+                dt_format = "%Y-%m-%d %H:%M"
+                for col in ['Start Time', 'End Time']:
+                    if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
+                        export_df[col] = export_df[col].dt.strftime(dt_format)
+                if '_changed_columns' in export_df.columns:
+                    export_df['_changed_columns'] = changed_group_labels(export_df['_changed_columns'])
                 
                 # CSV export functionality
-                csv_data = final_df[selected_user_cols].to_csv(index=False, encoding='utf-8-sig')
+                csv_data = export_df.to_csv(index=False, encoding='utf-8-sig')
                 st.download_button(
                     label="📥 Export to CSV", 
                     data=csv_data,
@@ -288,10 +348,37 @@ if latest_folder:
                     key="csv_export_button"
                 )
                 
-                st.markdown('<div class="table-container">', unsafe_allow_html=True)
-                html_table = to_html_table(final_df, header_labels, columns_to_display=selected_user_cols, data_dir=latest_folder)
-                st.markdown(html_table, unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
+                if table_mode == "Interactive":
+                    _, (payload_id, table_payload) = table_payload_stage(
+                        filter_key, filtered_df, header_labels, ordered_all_cols,
+                        data_dir=latest_folder, session_state=st.session_state)
+                    render_calendar_table(payload_id, table_payload, selected_user_cols, key="calendar_table")
+                else:
+                    # Only the visible page is rendered and sent to the browser
+                    page_col, size_col, count_col = st.columns([1, 1, 2])
+                    with size_col:
+                        page_size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, index=1, key="table_page_size")
+                    _, _, _, page_count = page_bounds(len(filtered_df), page_size)
+                    if st.session_state.get("table_page", 1) > page_count:
+                        st.session_state.table_page = page_count
+                    with page_col:
+                        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                                               key="table_page") - 1
+                    row_start, row_stop, page, _ = page_bounds(len(filtered_df), page_size, page)
+                    with count_col:
+                        st.caption(f"Rows {row_start + 1 if row_stop else 0}-{row_stop} of {len(filtered_df)}")
+
+                    st.markdown('<div class="table-container">', unsafe_allow_html=True)
+                    _, html_table = render_stage(filter_key, filtered_df, header_labels, selected_user_cols,
+                                                 data_dir=latest_folder, session_state=st.session_state,
+                                                 page_size=page_size, page=page)
+                    st.markdown(html_table, unsafe_allow_html=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+            # Status, date and hero changes of one event across every loaded snapshot
+            if 'unique_id' in filtered_df.columns:
+                with st.expander("History of an event", expanded=False):
+                    render_event_history(filtered_df, latest_folder, rules, en_map, ja_map, timezone)
 
         else:
             st.warning("No events found in the selected date range.")
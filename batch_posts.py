@@ -0,0 +1,210 @@
+"""
+Headless batch run of the dashboard pipeline, e.g. for nightly post drafts:
+
+    load_all_data -> compare_dataframes -> format_dataframe_for_display -> forum / Discord templates
+
+For every (latest, diff) snapshot pair it writes to OUT/<latest>__vs__<diff>/:
+    diff_table.csv / diff_table.html   every event in the date range with its diff status
+    forum_en.txt / forum_ja.txt        forum summaries for the changed events
+    discord_posts.jsonl / .zip         one Discohook payload per changed event
+    timings.json                       seconds per stage
+
+Run from the project root (data/ paths are relative), e.g.
+    python batch_posts.py V7900R-2025-09-15 V7800R-2025-09-01 --out drafts
+    python batch_posts.py A B --pair C D --pair E F --workers 3 --start 2025-09-15 --end 2025-09-30
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from modules.data_loader import load_all_data, refresh_hero_master
+from modules.diff_engine import changed_group_labels, compare_dataframes
+from modules.discord_post_creator import (load_discord_templates, build_template_context, generate_discord_posts,
+                                          posts_to_jsonl, posts_to_zip)
+from modules.display_formatter import (format_dataframe_for_display, filter_by_start_date, to_html_table,
+                                       add_template_hero_columns)
+from modules.forum_post_creator import load_template, generate_forum_posts
+from modules.translation_engine import create_translation_dicts
+
+# --- Configuration ---
+CONFIG_FILE = Path("data") / "config.json"
+RULES_FILE = Path("data") / "type_mapping_rules.json"
+
+TABLE_COLUMNS = ['Icon', 'Display Type', 'Event Name', 'Start Time', 'End Time', 'Duration',
+                 'Featured Heroes (EN)', 'Non-Featured Heroes (EN)',
+                 'Featured Heroes (JA)', 'Non-Featured Heroes (JA)',
+                 '_diff_status', '_changed_columns']
+HEADER_LABELS = {
+    "Icon": "Icon", "Display Type": "Type", "Start Time": "Start", "End Time": "End", "Duration": "Days",
+    "Featured Heroes (EN)": "Feat.(EN)", "Non-Featured Heroes (EN)": "Non-Feat.(EN)",
+    "Featured Heroes (JA)": "Feat.(JA)", "Non-Featured Heroes (JA)": "Non-Feat.(JA)",
+    "Event Name": "Event ID", "_diff_status": "Diff Status", "_changed_columns": "Changed Parts",
+}
+
+
+def _load_json(filepath, default):
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return default
+
+
+class _StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    def __call__(self, stage, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.timings[stage] = time.perf_counter() - started
+        return result
+
+
+def _table_frame(display_df):
+    table_df = display_df[[col for col in TABLE_COLUMNS if col in display_df.columns]].copy()
+    for col in ['Start Time', 'End Time']:
+        if col in table_df.columns and pd.api.types.is_datetime64_any_dtype(table_df[col]):
+            table_df[col] = table_df[col].dt.strftime("%Y-%m-%d %H:%M")
+    return table_df
+
+
+def _write_outputs(out_dir, table_df, forum_posts, discord_posts):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    csv_df = table_df.copy()
+    if '_changed_columns' in csv_df.columns:
+        csv_df['_changed_columns'] = changed_group_labels(csv_df['_changed_columns'])
+    csv_df.to_csv(out_dir / "diff_table.csv", index=False, encoding="utf-8-sig")
+    (out_dir / "diff_table.html").write_text(
+        to_html_table(table_df, HEADER_LABELS, columns_to_display=list(table_df.columns)), encoding="utf-8")
+    # Same separator as the forum creator's copy & paste summary
+    (out_dir / "forum_en.txt").write_text("\r\n".join(post["en"] for post in forum_posts), encoding="utf-8")
+    (out_dir / "forum_ja.txt").write_text("\r\n".join(post["ja"] for post in forum_posts), encoding="utf-8")
+    (out_dir / "discord_posts.jsonl").write_text(posts_to_jsonl(discord_posts), encoding="utf-8")
+    (out_dir / "discord_posts.zip").write_bytes(posts_to_zip(discord_posts))
+
+
+def run_pair(latest_folder, diff_folder, options):
+    """
+    Runs the whole pipeline for one snapshot pair and writes its outputs.
+    Returns {"pair", "out_dir", "events", "changed", "timings"}; module-level so a process pool can run it.
+    """
+    timer = _StageTimer()
+    started = time.perf_counter()
+    date_range = (options["start"], options["end"]) if options["start"] and options["end"] else None
+
+    data = timer("load", load_all_data, latest_folder, diff_folder, date_range=date_range)
+    if data['diff_df'] is None:
+        raise FileNotFoundError(f"Diff CSV file not found for {diff_folder}")
+    comparison_df = timer("diff", compare_dataframes, data['main_df'], data['diff_df'])
+    en_map, ja_map = create_translation_dicts(data['hero_master_df'], data['g_sheet_df'])
+
+    rules = _load_json(RULES_FILE, [])
+    display_df = timer("format", format_dataframe_for_display, comparison_df, rules, en_map, ja_map,
+                       options["timezone"])
+    if date_range:
+        display_df = timer("filter", filter_by_start_date, display_df, *date_range)
+    changed_df = add_template_hero_columns(display_df[display_df['_diff_status'] != 'unchanged'])
+
+    forum_posts = timer("forum", generate_forum_posts, changed_df, load_template())
+
+    discord_templates = load_discord_templates()
+    template = next((t for t in discord_templates if t["name"] == options["discord_template"]),
+                    discord_templates[0] if discord_templates else None)
+    discord_posts = []
+    if template is not None:
+        context_df = timer("discord_context", build_template_context, changed_df, en_map, ja_map)
+        discord_posts = timer("discord", generate_discord_posts, changed_df, template["template"], context_df)
+
+    out_dir = Path(options["out"]) / f"{latest_folder}__vs__{diff_folder}"
+    timer("write", _write_outputs, out_dir, _table_frame(display_df), forum_posts, discord_posts)
+
+    timings = {f"load.{name}": elapsed for name, elapsed in data['timings'].items()}
+    timings.update(timer.timings)
+    timings["total"] = time.perf_counter() - started
+    (out_dir / "timings.json").write_text(json.dumps(timings, indent=2), encoding="utf-8")
+    return {
+        "pair": (latest_folder, diff_folder),
+        "out_dir": str(out_dir),
+        "events": len(display_df),
+        "changed": len(changed_df),
+        "timings": timings,
+    }
+
+
+def _print_summary(result):
+    latest_folder, diff_folder = result["pair"]
+    print(f"{latest_folder} vs {diff_folder}: {result['events']} events, {result['changed']} changed "
+          f"-> {result['out_dir']}")
+    for stage, elapsed in result["timings"].items():
+        print(f"  {stage:<16} {elapsed:8.3f}s")
+
+
+def parse_args(argv=None):
+    config = _load_json(CONFIG_FILE, {})
+    parser = argparse.ArgumentParser(description="Diff snapshot pairs and write forum / Discord post drafts.")
+    parser.add_argument("latest", help="Latest snapshot folder (e.g. V7900R-2025-09-15)")
+    parser.add_argument("diff", help="Previous snapshot folder to diff against")
+    parser.add_argument("--pair", nargs=2, action="append", default=[], metavar=("LATEST", "DIFF"),
+                        help="Additional snapshot pair; may be repeated")
+    parser.add_argument("--out", default="output", help="Output directory (default: output)")
+    parser.add_argument("--start", default=config.get("post_start"),
+                        help="First event start date, YYYY-MM-DD (default: post_start from data/config.json)")
+    parser.add_argument("--end", default=config.get("post_end"),
+                        help="Last event start date, YYYY-MM-DD (default: post_end from data/config.json)")
+    parser.add_argument("--timezone", choices=["UTC", "JST"], default=config.get("timezone", "UTC"))
+    parser.add_argument("--discord-template", default=None,
+                        help="Discord template name (default: the first one in data/discord-template.json)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process pool size for multiple pairs (default: 1, run in this process)")
+    args = parser.parse_args(argv)
+    # One open bound would otherwise silently mean "every event in the snapshots"
+    if bool(args.start) != bool(args.end):
+        parser.error(f"--start and --end must both be set (got start={args.start!r}, end={args.end!r}; "
+                     "defaults come from post_start/post_end in data/config.json). "
+                     "Pass --start '' --end '' to process every event.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pairs = [(args.latest, args.diff)] + [tuple(pair) for pair in args.pair]
+    options = {
+        "out": args.out,
+        "start": args.start,
+        "end": args.end,
+        "timezone": args.timezone,
+        "discord_template": args.discord_template,
+    }
+
+    # Refresh the hero master once here, so the workers all find it fresh instead of racing to download it
+    refresh_hero_master()
+
+    failed = 0
+    if args.workers > 1 and len(pairs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(pairs))) as executor:
+            futures = [(pair, executor.submit(run_pair, *pair, options)) for pair in pairs]
+            for pair, future in futures:
+                try:
+                    _print_summary(future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f"{pair[0]} vs {pair[1]}: failed: {e}", file=sys.stderr)
+    else:
+        for pair in pairs:
+            try:
+                _print_summary(run_pair(*pair, options))
+            except Exception as e:
+                failed += 1
+                print(f"{pair[0]} vs {pair[1]}: failed: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
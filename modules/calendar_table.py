@@ -0,0 +1,168 @@
+# modules/calendar_table.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from modules.diff_engine import DIFF_STATUS_DTYPE, DIFF_STATUSES
+from modules.diff_spec import load_diff_spec
+from modules.display_formatter import cell_contents, change_highlights, sanitize_for_classname
+from modules.frame_registry import registry
+
+# Static frontend (plain HTML + JS, no build step, nothing loaded from a CDN)
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "components" / "calendar_table"
+STYLES_PATH = Path(__file__).resolve().parent.parent / "styles.css"
+# Payloads are served as static files of the component, so the browser downloads each one once
+PAYLOAD_DIR = COMPONENT_DIR / "payloads"
+# Payload files kept beyond the ones sessions hold; the least recently used are removed past this
+MAX_PAYLOAD_FILES = 32
+# Registry slot of the pipeline's table payload stage, whose values are (payload_id, payload)
+PAYLOAD_SLOT = 'table_payload'
+
+_calendar_table = None
+_published = OrderedDict()  # payload_id -> None, least recently used first; files known to be in PAYLOAD_DIR
+_publish_lock = threading.Lock()
+_styles_ids = {}  # (size, mtime_ns) of STYLES_PATH -> id of its published copy
+
+
+def _status_codes(df):
+    """`_diff_status` as indexes into the returned name list (DIFF_STATUSES first, then anything else seen)."""
+    if '_diff_status' not in df.columns:
+        return np.zeros(len(df), dtype=int), list(DIFF_STATUSES)
+    if df['_diff_status'].dtype == DIFF_STATUS_DTYPE:
+        # compare_dataframes output already carries the codes
+        return df['_diff_status'].cat.codes.to_numpy(dtype=int), list(DIFF_STATUSES)
+    statuses = df['_diff_status'].astype(str)
+    names = list(DIFF_STATUSES) + sorted(set(statuses.unique()) - set(DIFF_STATUSES))
+    return pd.Categorical(statuses, categories=names).codes.astype(int), names
+
+
+def _change_flags(df):
+    """The `_changed_columns` bitmask per row (bit i set when group i of the diff spec changed)."""
+    if '_changed_columns' not in df.columns:
+        return np.zeros(len(df), dtype=int)
+    return df['_changed_columns'].fillna(0).to_numpy(dtype=int)
+
+
+def calendar_table_payload(df, header_labels, columns, data_dir=None):
+    """
+    Compact JSON for the client-side table: one array of cell HTML per column (as in to_html_table),
+    plus the diff status and changed-column flags of each row as small integer codes.
+    """
+    status, status_names = _status_codes(df)
+    column_specs = [{
+        'key': col,
+        'label': str(header_labels.get(col, col)),
+        'cls': sanitize_for_classname(header_labels.get(col, col)),
+    } for col in columns]
+    cells = [cell_contents(df[col], col, data_dir).tolist() if col in df.columns else [""] * len(df)
+             for col in columns]
+    spec = load_diff_spec()
+    highlights = [{
+        'flag': spec.flags[group],
+        'cls': highlight_class,
+        'columns': [i for i, col in enumerate(columns) if applies(col)],
+    } for group, highlight_class, applies in change_highlights(spec)]
+    payload = {
+        'columns': column_specs,
+        'cells': cells,
+        'status': status.tolist(),
+        'statusNames': status_names,
+        'modified': status_names.index('modified'),
+        'changed': _change_flags(df).tolist(),
+        'highlights': highlights,
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def payload_id(payload):
+    """Content hash of a calendar_table_payload, the name it is published under."""
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _write_static(path, text):
+    """Writes a file the component serves, through a temp file so the browser never sees it half written."""
+    PAYLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=PAYLOAD_DIR, prefix=f".{path.name}.",
+                                     delete=False) as fh:
+        tmp_path = fh.name
+        fh.write(text)
+    os.replace(tmp_path, path)
+
+
+def _prune_payloads():
+    """Removes payload files past MAX_PAYLOAD_FILES, least recently used first, never one a session holds."""
+    keep = set(list(_published)[-MAX_PAYLOAD_FILES:])
+    keep.update(value[0] for value in registry.pinned(PAYLOAD_SLOT))
+    for path in PAYLOAD_DIR.glob("*.json"):
+        if path.stem in keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        _published.pop(path.stem, None)
+
+
+def publish_payload(payload, digest=None):
+    """
+    Makes sure PAYLOAD_DIR holds a calendar_table_payload as `<digest>.json` (digest defaults to
+    payload_id(payload)) and returns the digest. The component fetches `payloads/<digest>.json` only
+    when the digest changes, so a rerun sends the digest instead of the rows.
+
+    Payloads this process already published are only looked up in memory; the file is written again
+    only when it was pruned. Payloads held by a session (see FrameRegistry.pinned) are never pruned,
+    so a tab that has not fetched its rows yet still finds them.
+    """
+    digest = digest or payload_id(payload)
+    with _publish_lock:
+        if digest in _published:
+            _published.move_to_end(digest)
+            return digest
+        path = PAYLOAD_DIR / f"{digest}.json"
+        if not path.exists():
+            _write_static(path, payload)
+        _published[digest] = None
+        _prune_payloads()
+    return digest
+
+
+def _publish_styles():
+    """Id of styles.css as published to PAYLOAD_DIR, or None without one; only re-read when it changed."""
+    try:
+        stat = STYLES_PATH.stat()
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_size, stat.st_mtime_ns)
+    styles_id = _styles_ids.get(signature)
+    if styles_id is None:
+        css = STYLES_PATH.read_text(encoding="utf-8")
+        styles_id = f"styles-{hashlib.sha1(css.encode('utf-8')).hexdigest()}"
+        _write_static(PAYLOAD_DIR / f"{styles_id}.css", css)
+        _styles_ids.clear()
+        _styles_ids[signature] = styles_id
+    return styles_id
+
+
+def render_calendar_table(payload_id, payload, visible_columns, height=600, key=None):
+    """
+    Shows the rows of a calendar_table_payload with virtual scrolling. Sorting and column toggling
+    happen in the browser; `visible_columns` only sets which columns are shown initially.
+    Streamlit re-sends component args on every rerun, so only the payload's id (computed once, by
+    the pipeline's table payload stage) and the id of the published styles.css go through them; the
+    rows and the styles are downloaded once per distinct file.
+    """
+    global _calendar_table
+    if _calendar_table is None:
+        # Imported here so the payload builder stays usable outside a Streamlit app
+        import streamlit.components.v1 as components
+        _calendar_table = components.declare_component("calendar_table", path=str(COMPONENT_DIR))
+    return _calendar_table(payload_id=publish_payload(payload, payload_id), styles_id=_publish_styles(),
+                           visible=list(visible_columns), height=height, key=key, default=None)
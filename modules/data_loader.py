@@ -1,91 +1,264 @@
 # modules/data_loader.py
 
-import io
+import hashlib
+import json
 import os
+import tempfile
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+
+from modules.snapshot_cache import (read_snapshot, snapshot_date_window, snapshot_hash,
+                                   SNAPSHOT_CACHE_DIR, WINDOW_MARGIN_DAYS)
 
 # --- Configuration ---
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 HERO_MASTER_FILE_ID = "1rpfF9gNclicG0wwtY_EMKKdlqsRBSKjB"
 SERVICE_ACCOUNT_FILE = "client_secret.json"
 EVENT_BASE_DIR = Path("D:/PyScript/EMP Extract/")
+HERO_MASTER_PATH = Path("data") / "hero_master.csv"
+HERO_MASTER_MANIFEST = Path("data") / ".hero_master_manifest.json"
+# Skip even the metadata request if the last check is younger than this (the sheet changes every ~6 hours)
+HERO_MASTER_TTL_SECONDS = 10 * 60
 
-def download_file_from_drive(file_id, local_filepath):
+class GoogleDriveClient:
     """
-    Downloads a file from Google Drive and saves it locally.
+    Thin wrapper around the Drive v3 API. Anything with the same two methods
+    (get_metadata / download_to) can be passed to the loader instead, e.g. a local fake.
     """
-    try:
+
+    def __init__(self, service_account_file=SERVICE_ACCOUNT_FILE):
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         creds = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        
-        service = build("drive", "v3", credentials=creds)
+            service_account_file, scopes=SCOPES)
+        self.service = build("drive", "v3", credentials=creds)
 
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
+    def get_metadata(self, file_id):
+        return self.service.files().get(
+            fileId=file_id, fields="md5Checksum,modifiedTime,size").execute()
+
+    def download_to(self, file_id, fh):
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = self.service.files().get_media(fileId=file_id)
         downloader = MediaIoBaseDownload(fh, request)
-        
         done = False
         while not done:
             status, done = downloader.next_chunk()
 
-        fh.seek(0)
+def _file_md5(filepath):
+    md5 = hashlib.md5()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+_md5_cache = {}  # str(path) -> ((size, mtime_ns), md5)
+
+def _cached_file_md5(filepath):
+    """_file_md5, recomputed only when the file's size or mtime changed since the last call in this process."""
+    stat = Path(filepath).stat()
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _md5_cache.get(str(filepath))
+    if cached is None or cached[0] != signature:
+        cached = (signature, _file_md5(filepath))
+        _md5_cache[str(filepath)] = cached
+    return cached[1]
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+def _save_manifest(manifest_path, manifest):
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+def download_file_from_drive(file_id, local_filepath, client=None):
+    """
+    Downloads a file from Google Drive and saves it locally.
+    The content is streamed into a temp file next to the target and renamed into place,
+    so readers never see a partially written file.
+    """
+    local_filepath = Path(local_filepath)
+    tmp_path = None
+    try:
+        if client is None:
+            client = GoogleDriveClient()
 
-        with open(local_filepath, "wb") as f:
-            f.write(fh.read())
-        
+        with tempfile.NamedTemporaryFile(
+                dir=local_filepath.parent, prefix=f".{local_filepath.name}.", delete=False) as fh:
+            tmp_path = fh.name
+            client.download_to(file_id, fh)
+
+        os.replace(tmp_path, local_filepath)
         return True
 
     except Exception as e:
         print(f"An error occurred while downloading from Google Drive: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
-def load_all_data(latest_folder, diff_folder=None):
+def refresh_hero_master(local_filepath=HERO_MASTER_PATH, file_id=HERO_MASTER_FILE_ID, client=None,
+                        ttl_seconds=HERO_MASTER_TTL_SECONDS, manifest_path=HERO_MASTER_MANIFEST):
     """
-    Loads all necessary data for the application.
+    Makes sure the local hero master is current, downloading only when Drive has a different version.
+
+    Within `ttl_seconds` of the last check nothing is requested at all. After that the Drive
+    md5Checksum (or modifiedTime when Drive has no checksum) is compared with the local copy.
+    Returns 'fresh', 'unchanged', 'downloaded' or 'stale' (Drive unreachable, old local copy kept).
     """
-    # --- Load local event data ---
-    data_path = EVENT_BASE_DIR / latest_folder
-    event_filename = f"calendar-export-{latest_folder}.csv"
-    event_file_path = data_path / event_filename
-    
-    if not event_file_path.exists():
-        raise FileNotFoundError(f"Event CSV file not found: {event_file_path}")
-    
-    main_df = pd.read_csv(event_file_path)
-    
-    diff_df = None
-    if diff_folder:
-        diff_path = EVENT_BASE_DIR / diff_folder
-        diff_event_filename = f"calendar-export-{diff_folder}.csv"
-        diff_file_path = diff_path / diff_event_filename
-        
-        if diff_file_path.exists():
-            diff_df = pd.read_csv(diff_file_path)
-        else:
-            print(f"Warning: Diff CSV file not found: {diff_file_path}")
-
-    # --- Download and load hero data ---
-    local_hero_master_path = Path("data") / "hero_master.csv"
-    local_hero_master_path.parent.mkdir(exist_ok=True)
-    
-    # Always download fresh data (updated every 6 hours)
-    download_file_from_drive(HERO_MASTER_FILE_ID, local_hero_master_path)
-    
-    hero_df = pd.read_csv(local_hero_master_path)
-    
+    local_filepath = Path(local_filepath)
+    local_filepath.parent.mkdir(exist_ok=True)
+    manifest = _load_manifest(manifest_path)
+    now = time.time()
+
+    if (local_filepath.exists() and manifest.get("file_id") == file_id
+            and now - manifest.get("checked_at", 0) < ttl_seconds):
+        return "fresh"
+
+    try:
+        if client is None:
+            client = GoogleDriveClient()
+        metadata = client.get_metadata(file_id)
+    except Exception as e:
+        print(f"An error occurred while checking Google Drive metadata: {e}")
+        return "stale"
+
+    remote_md5 = metadata.get("md5Checksum")
+    if not local_filepath.exists():
+        unchanged = False
+    elif remote_md5:
+        unchanged = remote_md5 == _cached_file_md5(local_filepath)
+    else:
+        unchanged = (manifest.get("file_id") == file_id
+                     and metadata.get("modifiedTime") is not None
+                     and metadata.get("modifiedTime") == manifest.get("modifiedTime"))
+
+    if unchanged:
+        status = "unchanged"
+    elif download_file_from_drive(file_id, local_filepath, client=client):
+        status = "downloaded"
+    else:
+        return "stale"
+
+    _save_manifest(manifest_path, {
+        "file_id": file_id,
+        "md5Checksum": remote_md5,
+        "modifiedTime": metadata.get("modifiedTime"),
+        "checked_at": now,
+    })
+    return status
+
+def snapshot_csv_path(folder, base_dir=None):
+    base_dir = EVENT_BASE_DIR if base_dir is None else Path(base_dir)
+    return base_dir / folder / f"calendar-export-{folder}.csv"
+
+def _load_diff_snapshot(diff_folder, window, base_dir=None):
+    diff_file_path = snapshot_csv_path(diff_folder, base_dir)
+    if diff_file_path.exists():
+        return read_snapshot(diff_file_path, date_window=window, fingerprints=True)
+    print(f"Warning: Diff CSV file not found: {diff_file_path}")
+    return None
+
+def _load_hero_master(drive_client, hero_master_ttl):
+    # Only downloads when the Drive copy changed (updated every 6 hours); no TTL means the local copy is used as is
+    if hero_master_ttl is not None or not HERO_MASTER_PATH.exists():
+        refresh_hero_master(HERO_MASTER_PATH, client=drive_client,
+                            ttl_seconds=HERO_MASTER_TTL_SECONDS if hero_master_ttl is None else hero_master_ttl)
+    return pd.read_csv(HERO_MASTER_PATH)
+
+def _hero_frames(hero_df):
+    """(hero_master_df, g_sheet_df): the hero master as read, and a copy with hero_en/hero_ja column names."""
     hero_master_df = hero_df.copy()
     g_sheet_df = hero_df.copy()
     
     if g_sheet_df is not None:
         g_sheet_df.rename(columns={'heroname_en': 'hero_en', 'heroname_ja': 'hero_ja'}, inplace=True)
+    return hero_master_df, g_sheet_df
+
+def load_hero_data(drive_client=None, hero_master_ttl=HERO_MASTER_TTL_SECONDS):
+    """The hero part of load_all_data, for callers that get their snapshots elsewhere (e.g. the event store)."""
+    return _hero_frames(_load_hero_master(drive_client, hero_master_ttl))
+
+def source_fingerprints(latest_folder, diff_folder=None, base_dir=None):
+    """
+    Content hashes of everything load_all_data reads, for keying processed results. Called on every
+    rerun, so it never contacts Drive (the hero master is refreshed on "Load Data" and by the snapshot
+    watcher), and the local hero master is only re-hashed when its size or mtime moved.
+    """
+    event_file_path = snapshot_csv_path(latest_folder, base_dir)
+    if not event_file_path.exists():
+        raise FileNotFoundError(f"Event CSV file not found: {event_file_path}")
+
+    diff_file_path = snapshot_csv_path(diff_folder, base_dir) if diff_folder else None
+    return {
+        'latest': snapshot_hash(event_file_path),
+        'diff': snapshot_hash(diff_file_path) if diff_file_path and diff_file_path.exists() else None,
+        'hero_master': _cached_file_md5(HERO_MASTER_PATH) if HERO_MASTER_PATH.exists() else None,
+    }
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def load_all_data(latest_folder, diff_folder=None, drive_client=None,
+                  hero_master_ttl=HERO_MASTER_TTL_SECONDS, concurrent=True,
+                  date_range=None, margin_days=WINDOW_MARGIN_DAYS, base_dir=None):
+    """
+    Loads all necessary data for the application.
+    `drive_client` replaces the Google Drive client (e.g. a local fake); see GoogleDriveClient.
+    `hero_master_ttl=None` reads the local hero master without checking Drive (it is still downloaded
+    when missing), for callers that refresh it themselves.
+
+    With concurrent=True the latest snapshot, the diff snapshot and the hero master
+    (network-bound) are loaded on a thread pool, so a cold load takes about as long as the
+    slowest of the three. Per-source timings in seconds are returned under 'timings'.
+
+    `date_range` = (start_date, end_date) loads only events overlapping that range, widened by
+    `margin_days` so events moved across the edge are still matched by the diff.
+    Snapshot folders are looked up under `base_dir` (EVENT_BASE_DIR by default).
+    """
+    # --- Load local event data ---
+    event_file_path = snapshot_csv_path(latest_folder, base_dir)
+    
+    if not event_file_path.exists():
+        raise FileNotFoundError(f"Event CSV file not found: {event_file_path}")
+
+    window = snapshot_date_window(*date_range, margin_days=margin_days) if date_range else None
+
+    tasks = {
+        # Row fingerprints only matter for the diff; without one they would end up in the displayed frame
+        'main_df': (read_snapshot, event_file_path, SNAPSHOT_CACHE_DIR, window, bool(diff_folder)),
+        'diff_df': (_load_diff_snapshot, diff_folder, window, base_dir) if diff_folder else None,
+        'hero_df': (_load_hero_master, drive_client, hero_master_ttl),
+    }
+    tasks = {name: task for name, task in tasks.items() if task is not None}
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = {name: executor.submit(_timed, *task) for name, task in tasks.items()}
+            results = {name: future.result() for name, future in futures.items()}
+    else:
+        results = {name: _timed(*task) for name, task in tasks.items()}
+
+    main_df = results['main_df'][0]
+    diff_df = results['diff_df'][0] if 'diff_df' in results else None
+
+    # --- Hero data ---
+    hero_master_df, g_sheet_df = _hero_frames(results['hero_df'][0])
 
     return {
         'main_df': main_df,
         'diff_df': diff_df,
         'hero_master_df': hero_master_df,
-        'g_sheet_df': g_sheet_df
+        'g_sheet_df': g_sheet_df,
+        'timings': {name: elapsed for name, (_, elapsed) in results.items()},
     }
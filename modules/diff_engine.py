@@ -1,6 +1,32 @@
+import time
+
 import pandas as pd
 import numpy as np
 
+from modules.diff_spec import DEFAULT_DIFF_SPEC, compile_diff_spec, load_diff_spec
+
+# Bump whenever compare_dataframes output changes; persisted results are keyed on it
+DIFF_ENGINE_VERSION = 2
+
+HERO_COLS_H = [f'H{i}' for i in range(1, 7)]
+HERO_COLS_C = [f'C{i}' for i in range(1, 7)]
+DATE_COLS = ['startDate', 'endDate']
+
+# `_diff_status` is a categorical over DIFF_STATUSES; `_changed_columns` is a bitmask where bit i is
+# set when group i of the diff spec changed (see modules/diff_spec.py; new groups are appended, keeping existing bits)
+DIFF_STATUSES = ['unchanged', 'new', 'deleted', 'modified', 'shifted']
+DIFF_STATUS_DTYPE = pd.CategoricalDtype(DIFF_STATUSES)
+
+# Per-row content hash carried by snapshot frames (see row_fingerprints); never part of the diff output
+FINGERPRINT_COLUMN = '_fingerprint'
+
+def row_fingerprints(df, spec=None):
+    """
+    Stable 64-bit hash per row over what compare_dataframes compares under `spec` (the loaded
+    diff spec by default). Rows with equal fingerprints are unchanged.
+    """
+    return compile_diff_spec(spec if spec is not None else load_diff_spec()).fingerprints(df)
+
 def _are_different(val1, val2):
     """Helper to compare values, treating NaNs as equal."""
     if pd.isna(val1) and pd.isna(val2):
@@ -9,13 +35,55 @@ def _are_different(val1, val2):
         return True
     return val1 != val2
 
-def compare_dataframes(current_df, previous_df):
-    hero_cols_h = [f'H{i}' for i in range(1, 7)]
-    hero_cols_c = [f'C{i}' for i in range(1, 7)]
-    date_cols = ['startDate', 'endDate']
+def has_changed(changed_columns, group, spec=None):
+    """Boolean array: rows of a `_changed_columns` bitmask column where `group` changed (missing counts as no change)."""
+    spec = compile_diff_spec(spec if spec is not None else load_diff_spec())
+    values = pd.Series(changed_columns).fillna(0).to_numpy(dtype='uint64')
+    return (values & np.uint64(spec.flags[group])) != 0
+
+def changed_group_labels(changed_columns, separator=", ", spec=None):
+    """`_changed_columns` bitmasks as text, e.g. 'dates, featured_heroes' (one label per distinct mask)."""
+    spec = compile_diff_spec(spec if spec is not None else load_diff_spec())
+    values = pd.Series(changed_columns).fillna(0).to_numpy(dtype='uint64')
+    masks, inverse = np.unique(values, return_inverse=True)
+    labels = np.array([separator.join(name for name in spec.names if int(mask) & spec.flags[name])
+                       for mask in masks], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+def changed_group_names(changed_columns, spec=None):
+    """`_changed_columns` bitmasks as lists of group names, e.g. ['dates', 'featured_heroes'] (one list per row)."""
+    spec = compile_diff_spec(spec if spec is not None else load_diff_spec())
+    values = pd.Series(changed_columns).fillna(0).to_numpy(dtype='uint64')
+    masks, inverse = np.unique(values, return_inverse=True)
+    names = [[name for name in spec.names if int(mask) & spec.flags[name]] for mask in masks]
+    result = np.empty(len(values), dtype=object)
+    for i, mask_index in enumerate(inverse.reshape(-1)):
+        result[i] = list(names[mask_index])
+    return result
+
+def with_diff_status(df, status, spec=None):
+    """
+    Copy of `df` with every row given `status` and no changed columns, encoded like the
+    compare_dataframes output (e.g. a snapshot shown without a diff).
+    """
+    spec = compile_diff_spec(spec if spec is not None else load_diff_spec())
+    return df.assign(_diff_status=pd.Categorical([status] * len(df), dtype=DIFF_STATUS_DTYPE),
+                     _changed_columns=np.zeros(len(df), dtype=spec.mask_dtype))
+
+def _sort_by_start_date(result_df):
+    result_df['sort_key'] = pd.to_datetime(result_df['startDate'], errors='coerce')
+    result_df.sort_values(by='sort_key', inplace=True, na_position='last')
+    result_df.drop(columns='sort_key', inplace=True)
+    return result_df
+
+def _compare_dataframes_rowwise(current_df, previous_df):
+    """Reference implementation: walks the merged snapshots one row at a time, comparing the DEFAULT_DIFF_SPEC groups."""
+    hero_cols_h = HERO_COLS_H
+    hero_cols_c = HERO_COLS_C
+    date_cols = DATE_COLS
 
-    # Initialize the new column with a default value
-    current_df['original_startDate'] = np.nan
+    # Initialize the new column with a default value (on a copy; snapshot frames may be shared)
+    current_df = current_df.assign(original_startDate=np.nan)
 
     # Stage 1: Initial diff on diff_id
     merged_df = pd.merge(
@@ -121,9 +189,228 @@ def compare_dataframes(current_df, previous_df):
         if matched_deleted_indices:
             result_df.drop(matched_deleted_indices, inplace=True)
 
+    # Same encoding as the columnar mode under the default diff spec
+    spec = compile_diff_spec(DEFAULT_DIFF_SPEC)
+    result_df['_diff_status'] = result_df['_diff_status'].astype(DIFF_STATUS_DTYPE)
+    result_df['_changed_columns'] = np.array(
+        [sum(spec.flags[group] for group in changed) for changed in result_df['_changed_columns']],
+        dtype=spec.mask_dtype)
+
     # Final sort
-    result_df['sort_key'] = pd.to_datetime(result_df['startDate'], errors='coerce')
-    result_df.sort_values(by='sort_key', inplace=True, na_position='last')
-    result_df.drop(columns='sort_key', inplace=True)
-    
-    return result_df
\ No newline at end of file
+    return _sort_by_start_date(result_df)
+
+def _result_columns(merged_is_deleted, current_df, previous_df):
+    """
+    Column order of the row-wise result: keys are collected in first-seen order,
+    so whichever of the current/previous column sets appears first in the merge wins.
+    """
+    curr_keys = list(current_df.columns) + ['_diff_status', '_changed_columns']
+    prev_keys = list(previous_df.columns) + ['_diff_status', '_changed_columns']
+    first_seen = []
+    if (~merged_is_deleted).any():
+        first_seen.append((np.argmax(~merged_is_deleted), curr_keys))
+    if merged_is_deleted.any():
+        first_seen.append((np.argmax(merged_is_deleted), prev_keys))
+    first_seen.sort(key=lambda item: item[0])
+    return list(dict.fromkeys(key for _, keys in first_seen for key in keys))
+
+def _same_fingerprint(merged_df):
+    """Merged rows whose current and previous fingerprints are equal (False where either is missing)."""
+    if f'{FINGERPRINT_COLUMN}_curr' not in merged_df.columns or f'{FINGERPRINT_COLUMN}_prev' not in merged_df.columns:
+        return np.zeros(len(merged_df), dtype=bool)
+    same = merged_df[f'{FINGERPRINT_COLUMN}_curr'] == merged_df[f'{FINGERPRINT_COLUMN}_prev']
+    return same.fillna(False).to_numpy(dtype=bool)
+
+def _any_changed(changes, n_rows):
+    """Rows where any group of a {group name: boolean array} mapping changed."""
+    changed = np.zeros(n_rows, dtype=bool)
+    for flags in changes.values():
+        changed |= flags
+    return changed
+
+def _compare_dataframes_columnar(current_df, previous_df, spec):
+    """
+    Same result as `_compare_dataframes_rowwise`, computed with whole-column operations.
+    When both frames carry row fingerprints, matched rows with equal fingerprints are unchanged
+    and only the others are compared field by field.
+    """
+    if FINGERPRINT_COLUMN in current_df.columns and FINGERPRINT_COLUMN in previous_df.columns:
+        # Nullable, so unmatched rows of the outer merge do not turn the hashes into floats
+        current_df = current_df.assign(**{FINGERPRINT_COLUMN: current_df[FINGERPRINT_COLUMN].astype('UInt64')})
+        previous_df = previous_df.assign(**{FINGERPRINT_COLUMN: previous_df[FINGERPRINT_COLUMN].astype('UInt64')})
+    else:
+        current_df = current_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+        previous_df = previous_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+
+    # Initialize the new column with a default value (on a copy; snapshot frames may be shared)
+    current_df = current_df.assign(original_startDate=np.nan)
+
+    # Stage 1: Initial diff on diff_id
+    merged_df = pd.merge(
+        current_df.add_suffix('_curr'),
+        previous_df.add_suffix('_prev'),
+        left_on='diff_id_curr',
+        right_on='diff_id_prev',
+        how='outer'
+    )
+
+    is_new = merged_df['diff_id_prev'].isna().to_numpy()
+    is_deleted = merged_df['diff_id_curr'].isna().to_numpy() & ~is_new
+    is_matched = ~(is_new | is_deleted)
+    needs_check = is_matched & ~_same_fingerprint(merged_df)
+    current_df = current_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+    previous_df = previous_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+
+    result_data = {}
+    for col in _result_columns(is_deleted, current_df, previous_df):
+        if col in ('_diff_status', '_changed_columns'):
+            continue
+        curr = merged_df[f'{col}_curr'] if col in current_df.columns else None
+        prev = merged_df[f'{col}_prev'] if col in previous_df.columns else None
+        if curr is not None and prev is not None and (
+                isinstance(curr.dtype, pd.CategoricalDtype) or isinstance(prev.dtype, pd.CategoricalDtype)):
+            # Snapshots carry their own categories, which cannot be mixed in place
+            curr, prev = curr.astype(object), prev.astype(object)
+        if curr is None:
+            result_data[col] = prev.where(is_deleted)
+        elif prev is None:
+            result_data[col] = curr.where(~is_deleted)
+        else:
+            result_data[col] = curr.where(~is_deleted, prev)
+
+    # This block only covers rows that matched on diff_id,
+    # meaning they are not date-moved events.
+    checked_changes = spec.group_changes(merged_df[needs_check], '_curr', '_prev')
+    changed = {}
+    for name, flags in checked_changes.items():
+        changed[name] = np.zeros(len(merged_df), dtype=bool)
+        changed[name][needs_check] = flags
+
+    status = np.where(is_new, 'new', np.where(is_deleted, 'deleted', 'unchanged')).astype(object)
+    status[_any_changed(changed, len(merged_df))] = 'modified'
+
+    result_df = pd.DataFrame(result_data, index=merged_df.index)
+    result_df['_diff_status'] = pd.Categorical(status, dtype=DIFF_STATUS_DTYPE)
+    result_df['_changed_columns'] = spec.change_mask(changed)
+    result_df = result_df[_result_columns(is_deleted, current_df, previous_df)]
+
+    # Stage 2: Find moved events and perform detailed diff on them
+    new_mask = result_df['_diff_status'] == 'new'
+    deleted_mask = result_df['_diff_status'] == 'deleted'
+
+    if new_mask.any() and deleted_mask.any() and 'unique_id' in result_df.columns:
+        compare_cols = [col for col in dict.fromkeys(['unique_id', 'startDate'] + spec.columns) if col in result_df.columns]
+
+        def _candidates(mask):
+            rows = result_df.loc[mask, compare_cols].dropna(subset=['unique_id'])
+            rows['_match_key'] = rows['unique_id'].astype(str).str.strip()
+            rows['_row'] = rows.index
+            # Later rows win on duplicate unique_ids, as with a dict built from the column
+            return rows.drop_duplicates('_match_key', keep='last')
+
+        pairs = pd.merge(
+            _candidates(new_mask), _candidates(deleted_mask),
+            on='_match_key', suffixes=('_new', '_del')
+        )
+        pair_changes = spec.group_changes(pairs, '_new', '_del')
+        is_shifted = _any_changed(pair_changes, len(pairs))
+        if is_shifted.any():
+            shifted_idx = pairs.loc[is_shifted, '_row_new'].to_numpy()
+            result_df.loc[shifted_idx, '_diff_status'] = 'shifted'
+            result_df.loc[shifted_idx, 'original_startDate'] = pairs.loc[is_shifted, 'startDate_del'].to_numpy()
+            result_df.loc[shifted_idx, '_changed_columns'] = spec.change_mask(
+                {name: flags[is_shifted] for name, flags in pair_changes.items()})
+            result_df.drop(pairs.loc[is_shifted, '_row_del'].to_numpy(), inplace=True)
+
+    # Final sort
+    return _sort_by_start_date(result_df)
+
+def compare_dataframes(current_df, previous_df, mode='columnar', spec=None):
+    """
+    Diffs two calendar snapshots on diff_id, then pairs new/deleted rows on unique_id
+    to detect shifted events. `spec` (a diff spec list or CompiledDiffSpec, the loaded
+    diff_spec.json by default) decides which column groups are compared and how.
+
+    mode='columnar' (default) uses whole-column operations; mode='rowwise' runs the
+    original per-row loop over the default groups and is kept as the reference
+    implementation. Row fingerprints (FINGERPRINT_COLUMN, see row_fingerprints) on both
+    frames let the columnar mode skip the field comparison of unchanged rows; they are
+    not part of the result.
+    """
+    loaded_spec = load_diff_spec()
+    spec = compile_diff_spec(spec) if spec is not None else loaded_spec
+    if mode == 'columnar':
+        if spec.key != loaded_spec.key:
+            # Stored fingerprints hash the loaded spec's groups, so they say nothing under another spec
+            current_df = current_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+            previous_df = previous_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+        return _compare_dataframes_columnar(current_df, previous_df, spec)
+    if mode == 'rowwise':
+        return _compare_dataframes_rowwise(current_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore'),
+                                           previous_df.drop(columns=FINGERPRINT_COLUMN, errors='ignore'))
+    raise ValueError(f"Unknown diff mode: {mode}")
+
+
+def synthetic_snapshots(n_rows, seed=0, hero_ids=None):
+    """
+    (current, previous) snapshot frames for equivalence tests and timing: about 5% of rows change
+    dates, 5% get new featured heroes (the rest the same set in reverse column order), 3% move to a
+    new diff_id, 2% are deleted and 2% added. `hero_ids` is the pool heroes are drawn from.
+    """
+    rng = np.random.default_rng(seed)
+    hero_pool = np.asarray(hero_ids if hero_ids is not None else [f'hero_{i}' for i in range(400)], dtype=object)
+
+    def _heroes(n, fill_ratio):
+        block = rng.choice(hero_pool, size=(n, 6))
+        block[rng.random((n, 6)) > fill_ratio] = np.nan
+        return block
+
+    start = rng.integers(800_000_000, 830_000_000, n_rows)
+    previous = pd.DataFrame({
+        'diff_id': [f'd{i}' for i in range(n_rows)],
+        'unique_id': [f'u{i}' for i in range(n_rows)],
+        'event': [f'event_{i % 50}' for i in range(n_rows)],
+        'startDate': start,
+        'endDate': start + rng.integers(1, 14, n_rows) * 86400,
+    })
+    previous[HERO_COLS_H] = _heroes(n_rows, 0.4)
+    previous[HERO_COLS_C] = _heroes(n_rows, 0.2)
+
+    current = previous.copy()
+    changed = rng.random(n_rows) < 0.05
+    current.loc[changed, 'endDate'] += 86400
+    reshuffled = rng.random(n_rows) < 0.05
+    current.loc[reshuffled, HERO_COLS_H] = _heroes(int(reshuffled.sum()), 0.4)
+    # Same hero set in a different column order must not count as a change
+    current.loc[~reshuffled, HERO_COLS_H] = current.loc[~reshuffled, HERO_COLS_H[::-1]].to_numpy()
+    moved = rng.random(n_rows) < 0.03
+    current.loc[moved, 'diff_id'] = [f'm{i}' for i in range(int(moved.sum()))]
+    current.loc[moved, 'startDate'] += 3600
+    current = current[rng.random(n_rows) > 0.02]
+    extra = previous.sample(frac=0.02, random_state=seed).assign(
+        diff_id=lambda df: 'x' + df['diff_id'], unique_id=lambda df: 'x' + df['unique_id'])
+    return pd.concat([current, extra], ignore_index=True), previous
+
+
+# For testing: equivalence and timing of both modes on synthetic snapshots (tests/test_diff_engine.py runs the check)
+if __name__ == "__main__":
+    for n_rows in (2_000, 20_000):
+        current, previous = synthetic_snapshots(n_rows)
+        timings = {}
+        results = {}
+        for mode in ('rowwise', 'columnar'):
+            started = time.perf_counter()
+            results[mode] = compare_dataframes(current.copy(), previous.copy(), mode=mode, spec=DEFAULT_DIFF_SPEC)
+            timings[mode] = time.perf_counter() - started
+        # Fingerprints are computed once per snapshot at ingest, so they are not part of the timing
+        current_fp = current.assign(**{FINGERPRINT_COLUMN: row_fingerprints(current, DEFAULT_DIFF_SPEC)})
+        previous_fp = previous.assign(**{FINGERPRINT_COLUMN: row_fingerprints(previous, DEFAULT_DIFF_SPEC)})
+        started = time.perf_counter()
+        results['fingerprinted'] = compare_dataframes(current_fp, previous_fp, spec=DEFAULT_DIFF_SPEC)
+        timings['fingerprinted'] = time.perf_counter() - started
+        for mode in ('columnar', 'fingerprinted'):
+            pd.testing.assert_frame_equal(results['rowwise'], results[mode], check_dtype=False)
+        print(f"{n_rows:>7} rows: rowwise {timings['rowwise']:.3f}s, columnar {timings['columnar']:.3f}s "
+              f"({timings['rowwise'] / timings['columnar']:.1f}x), "
+              f"fingerprinted {timings['fingerprinted']:.3f}s, "
+              f"{results['columnar']['_diff_status'].value_counts().to_dict()}")
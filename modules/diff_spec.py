@@ -0,0 +1,212 @@
+# modules/diff_spec.py
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+DIFF_SPEC_FILE = Path("data") / "diff_spec.json"
+# The groups compare_dataframes has always compared; used when diff_spec.json is missing or unreadable
+DEFAULT_DIFF_SPEC = [
+    {"name": "dates", "compare": "scalar", "columns": ["startDate", "endDate"]},
+    {"name": "featured_heroes", "compare": "set", "columns": [f"H{i}" for i in range(1, 7)]},
+    {"name": "non_featured_heroes", "compare": "set", "columns": [f"C{i}" for i in range(1, 7)]},
+]
+# Smallest unsigned dtype holding one bit per group; the calendar table tests the bits with 32-bit JS operators
+MASK_DTYPES = [(8, 'uint8'), (16, 'uint16'), (32, 'uint32')]
+
+_compiled_spec_cache = {}
+_loaded_spec_cache = {}  # str(path) -> ((size, mtime_ns), CompiledDiffSpec)
+
+
+def columns_differ(left, right):
+    """Row-wise inequality of two aligned Series, treating NaNs as equal."""
+    left_na = left.isna().to_numpy()
+    right_na = right.isna().to_numpy()
+    values_differ = (left.to_numpy(dtype=object) != right.to_numpy(dtype=object))
+    return np.where(left_na | right_na, left_na != right_na, values_differ)
+
+
+def _joint_codes(left, right):
+    """Both blocks factorized together (equal values share a code, NaN is -1), as a (2, rows, cols) array."""
+    n_rows, n_cols = left.shape
+    values = np.concatenate([left.to_numpy(dtype=object).ravel(), right.to_numpy(dtype=object).ravel()])
+    codes, _ = pd.factorize(values)
+    return codes.reshape(2, n_rows, n_cols)
+
+
+def scalars_differ(left, right):
+    """Rows where any column of two equally shaped blocks differs."""
+    differ = np.zeros(len(left), dtype=bool)
+    for left_col, right_col in zip(left.columns, right.columns):
+        differ |= columns_differ(left[left_col], right[right_col])
+    return differ
+
+
+def sets_differ(left, right):
+    """
+    Row-wise set inequality of two equally shaped blocks, ignoring NaN.
+    Each row is reduced to its sorted unique codes and compared as a plain int matrix.
+    """
+    if len(left) == 0:
+        return np.zeros(0, dtype=bool)
+    codes = np.sort(_joint_codes(left, right), axis=2)
+    duplicated = np.zeros(codes.shape, dtype=bool)
+    duplicated[..., 1:] = codes[..., 1:] == codes[..., :-1]
+    codes[duplicated] = -1
+    codes.sort(axis=2)
+    return (codes[0] != codes[1]).any(axis=1)
+
+
+def lists_differ(left, right):
+    """
+    Row-wise inequality of the ordered lists in two equally shaped blocks: the non-NaN values in
+    column order, so a gap does not count as a change but a reordering does.
+    """
+    if len(left) == 0:
+        return np.zeros(0, dtype=bool)
+    codes = _joint_codes(left, right)
+    # Stable sort on "is missing" packs each row's values to the left, keeping their order
+    codes = np.take_along_axis(codes, np.argsort(codes < 0, axis=2, kind='stable'), axis=2)
+    return (codes[0] != codes[1]).any(axis=1)
+
+
+COMPARATORS = {'scalar': scalars_differ, 'set': sets_differ, 'list': lists_differ}
+
+
+def _cell_hashes(column):
+    """uint64 hash per cell, 0 where missing. Numeric columns hash their float64 value, others their text."""
+    hashes = np.zeros(len(column), dtype='uint64')
+    if (pd.api.types.is_numeric_dtype(column.dtype) and not isinstance(column.dtype, pd.CategoricalDtype)):
+        values = column.to_numpy(dtype='float64')
+        present = ~np.isnan(values)
+        # int64 and float64 columns (a snapshot with a missing value) must hash the same
+        hashes[present] = pd.util.hash_pandas_object(pd.Series(values[present]), index=False).to_numpy()
+    else:
+        values = column.to_numpy(dtype=object)
+        present = pd.notna(values)
+        hashes[present] = pd.util.hash_array(values[present].astype(str).astype(object))
+    return hashes
+
+
+class CompiledDiffSpec:
+    """
+    diff_spec.json validated once: an ordered list of column groups, each compared as `scalar`
+    (any column differs), `set` (same values in any order, duplicates ignored) or `list` (same
+    values in the same order, gaps ignored). Group i sets bit i of `_changed_columns`.
+    """
+
+    def __init__(self, spec):
+        self.groups = []
+        for group in spec:
+            name, compare, columns = group.get('name'), group.get('compare', 'scalar'), group.get('columns', [])
+            if not name or name in self.names:
+                raise ValueError(f"Diff spec groups need a unique name: {group}")
+            if compare not in COMPARATORS:
+                raise ValueError(f"Unknown comparison '{compare}' in diff spec group '{name}'")
+            if not columns:
+                raise ValueError(f"Diff spec group '{name}' has no columns")
+            self.groups.append((name, compare, [str(col) for col in columns]))
+        bits, self.mask_dtype = next(((bits, dtype) for bits, dtype in MASK_DTYPES if len(self.groups) <= bits),
+                                     (None, None))
+        if bits is None:
+            raise ValueError(f"A diff spec can have at most {MASK_DTYPES[-1][0]} groups")
+        self.flags = {name: 1 << i for i, (name, _, _) in enumerate(self.groups)}
+        self.columns = list(dict.fromkeys(col for _, _, columns in self.groups for col in columns))
+        self.key = hashlib.sha1(json.dumps(self.groups).encode("utf-8")).hexdigest()
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.groups]
+
+    def group_changes(self, df, left_suffix, right_suffix):
+        """
+        {group name: boolean array} comparing the `<col><left_suffix>` and `<col><right_suffix>`
+        columns of one frame (e.g. a merge). A column missing on one side counts as all NaN.
+        """
+        changes = {}
+        for name, compare, columns in self.groups:
+            present = [col for col in columns
+                       if f'{col}{left_suffix}' in df.columns or f'{col}{right_suffix}' in df.columns]
+            if not present:
+                changes[name] = np.zeros(len(df), dtype=bool)
+                continue
+
+            def _block(suffix):
+                return pd.DataFrame({col: df[f'{col}{suffix}'] if f'{col}{suffix}' in df.columns
+                                     else pd.Series(np.nan, index=df.index, dtype=object)
+                                     for col in present}, index=df.index)
+
+            changes[name] = COMPARATORS[compare](_block(left_suffix), _block(right_suffix))
+        return changes
+
+    def change_mask(self, changes):
+        """The `_changed_columns` bitmask from {group name: boolean array}."""
+        mask = np.zeros(len(next(iter(changes.values()))) if changes else 0, dtype=self.mask_dtype)
+        for name, flags in changes.items():
+            mask[np.asarray(flags, dtype=bool)] |= self.flags[name]
+        return mask
+
+    def fingerprints(self, df):
+        """
+        Stable 64-bit hash per row over the spec's groups; rows with equal fingerprints are
+        unchanged under this spec. Set groups hash their sorted unique values, list groups their
+        values packed in column order.
+        """
+        parts = {}
+        for name, compare, columns in self.groups:
+            block = np.zeros((len(df), len(columns)), dtype='uint64')
+            for i, col in enumerate(columns):
+                if col in df.columns:
+                    block[:, i] = _cell_hashes(df[col])
+            if compare == 'set':
+                # 0 marks an empty slot; sorting, blanking repeats and sorting again leaves each row's set
+                block.sort(axis=1)
+                tail = block[:, 1:]
+                tail[tail == block[:, :-1]] = 0
+                block.sort(axis=1)
+            elif compare == 'list':
+                block = np.take_along_axis(block, np.argsort(block == 0, axis=1, kind='stable'), axis=1)
+            for i in range(block.shape[1]):
+                parts[(name, i)] = block[:, i]
+        if not parts:
+            return np.zeros(len(df), dtype='uint64')
+        frame = pd.DataFrame({f'{name}.{i}': values for (name, i), values in parts.items()})
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def compile_diff_spec(spec):
+    """Returns CompiledDiffSpec for a spec list, reusing the compiled form while the spec is unchanged."""
+    if isinstance(spec, CompiledDiffSpec):
+        return spec
+    key = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+    if key not in _compiled_spec_cache:
+        _compiled_spec_cache[key] = CompiledDiffSpec(spec)
+    return _compiled_spec_cache[key]
+
+
+def load_diff_spec(filepath=DIFF_SPEC_FILE):
+    """
+    The compiled diff spec from `filepath`, or DEFAULT_DIFF_SPEC when the file is missing or not valid JSON.
+    Called on every rerun, so the file is only parsed again when its size or mtime changed.
+    """
+    try:
+        stat = Path(filepath).stat()
+    except FileNotFoundError:
+        return compile_diff_spec(DEFAULT_DIFF_SPEC)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _loaded_spec_cache.get(str(filepath))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        spec = DEFAULT_DIFF_SPEC
+    compiled = compile_diff_spec(spec)
+    _loaded_spec_cache[str(filepath)] = (signature, compiled)
+    return compiled
@@ -5,8 +5,13 @@ import re
 from pathlib import Path
 from datetime import date
 import copy
+import numpy as np
+import io
+import zipfile
 
-from modules.display_formatter import format_dataframe_for_display
+from modules.display_formatter import (format_dataframe_for_display, filter_by_start_date, hero_name_lists,
+                                       add_template_hero_columns, template_changed_columns)
+from modules.template_engine import compile_json_template
 
 
 # --- Config Helpers ---
@@ -50,58 +55,192 @@ def load_discord_templates(template_path: Path | None = None) -> list:
 # --- JSON Template Processor ---
 def process_json_template(template_obj: dict, data_dict: dict) -> dict:
     """
-    Recursively process a JSON template object and replace {variables} with actual values.
+    Process a JSON template object and replace {variables} with actual values.
+    Only strings containing placeholders are rebuilt; the result shares every other part with the template.
     """
-    if isinstance(template_obj, dict):
-        result = {}
-        for key, value in template_obj.items():
-            result[key] = process_json_template(value, data_dict)
-        return result
-    elif isinstance(template_obj, list):
-        return [process_json_template(item, data_dict) for item in template_obj]
-    elif isinstance(template_obj, str):
-        # Process string template with {variable} replacement
-        output = ""
-        i = 0
-        while i < len(template_obj):
-            char = template_obj[i]
-            if char == "\\":  # Escape character
-                if i + 1 < len(template_obj):
-                    output += template_obj[i + 1]
-                    i += 2
-                else:
-                    output += char
-                    i += 1
-            elif char == "{":
-                end_brace = template_obj.find("}", i)
-                if end_brace != -1:
-                    key = template_obj[i + 1 : end_brace]
-                    value = data_dict.get(key)
-                    if value is not None:
-                        output += str(value) if pd.notna(value) else ""
-                    else:
-                        # If key not found, keep literal text
-                        output += f"{{{key}}}"
-                    i = end_brace + 1
-                else:
-                    output += char
-                    i += 1
-            else:
-                output += char
-                i += 1
-        return output
-    else:
-        return template_obj
+    return compile_json_template(template_obj).render(data_dict)
+
+
+# --- Template Variables ---
+# Map display column names to template variable names
+TEMPLATE_VARIABLE_MAPPING = {
+    'Event Name': 'event_name',
+    'event_title_en': 'event_title_en',
+    'event_title_ja': 'event_title_ja',
+    'start_date_md': 'start_date_md',
+    'Duration': 'duration_days',
+    'start_date_iso': 'start_date_iso',
+    'end_date_iso': 'end_date_iso',
+    'Featured Heroes (EN)': 'featured_heroes_en',
+    'Non-Featured Heroes (EN)': 'non_featured_heroes_en',
+    'questline': 'questline',
+    'banner': 'banner_url',
+    'url': 'event_url'
+}
+
+
+# Discord posts are written for Japanese readers: weekday and times are given in this timezone
+DISCORD_POST_TIMEZONE = "Asia/Tokyo"
+JA_WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+NON_FEATURED_EMOJIS = [
+    "<:emblemice:989041535691673624>",
+    "<:emblemholy:989041571167101022>",
+    "<:emblemfire:989041476833017886>",
+    "<:emblemice:989041535691673624>",
+]
+
+
+def _start_time_variables(start_time: pd.Series, post_timezone: str) -> dict:
+    """start_date_weekday / start_date_full / start_time_12h / start_time_24h in `post_timezone`."""
+    local = start_time.dt.tz_convert(post_timezone) if start_time.dt.tz is not None else start_time
+    valid = local.notna().to_numpy()
+    fields = {name: getattr(local.dt, name).fillna(0).astype(int).to_numpy()
+              for name in ('year', 'month', 'day', 'hour', 'minute', 'weekday')}
+    two_digits = np.array([f"{i:02d}" for i in range(60)], dtype=object)
+    hour = fields['hour']
+
+    weekday = np.array(JA_WEEKDAYS, dtype=object)[fields['weekday']]
+    full = (fields['year'].astype(str).astype(object) + "/" + fields['month'].astype(str).astype(object) + "/"
+            + fields['day'].astype(str).astype(object) + " (" + weekday + ")")
+    hour_12 = np.where(hour % 12 == 0, 12, hour % 12).astype(str).astype(object)
+    time_12h = hour_12 + ":" + two_digits[fields['minute']] + np.where(hour < 12, "AM", "PM").astype(object)
+    time_24h = two_digits[hour] + ":" + two_digits[fields['minute']]
+
+    return {name: np.where(valid, values, None) for name, values in (
+        ('start_date_weekday', weekday),
+        ('start_date_full', full),
+        ('start_time_12h', time_12h),
+        ('start_time_24h', time_24h),
+    )}
+
+
+def build_template_context(display_df: pd.DataFrame, en_map: dict, ja_map: dict,
+                           post_timezone: str = DISCORD_POST_TIMEZONE) -> pd.DataFrame:
+    """
+    Discord template variables for every row of a formatted frame at once, as columns aligned
+    with `display_df`: the mapped display columns, duration_days, individual heroes from the
+    per-hero name lists, the non-featured section and the weekday / date / time strings.
+    A None cell means the variable is not set for that row.
+    """
+    n_rows = len(display_df)
+    context = {}
+
+    for display_col, template_var in TEMPLATE_VARIABLE_MAPPING.items():
+        if display_col in display_df.columns:
+            context[template_var] = display_df[display_col].to_numpy(dtype=object)
+
+    # Days from duration ("3d 4h" -> "3"); durations without days are kept as they are
+    if 'duration_days' in context:
+        duration = pd.Series(context['duration_days'], dtype=object)
+        is_str = duration.map(type).to_numpy(dtype=object) == str
+        has_days = is_str & duration.str.contains('d', regex=False).fillna(False).to_numpy(dtype=bool)
+        context['duration_days'] = np.where(has_days, duration.str.split('d').str[0], duration)
+
+    hero_lists = hero_name_lists(display_df, en_map, ja_map)
+    for i in range(2):
+        context[f'featured_hero_{i + 1}_en'] = hero_lists[('H', 'en')][:, i]
+        context[f'featured_hero_{i + 1}_ja'] = hero_lists[('H', 'ja')][:, i]
+
+    non_featured_ja = hero_lists[('C', 'ja')]
+    for i in range(6):
+        context[f'non_featured_hero_{i + 1}_ja'] = non_featured_ja[:, i]
+    has_non_featured = pd.notna(non_featured_ja[:, 0])
+    context['has_non_featured_heroes'] = has_non_featured
+    section = np.full(n_rows, "**非注目追加**\n", dtype=object)
+    for i, emoji in enumerate(NON_FEATURED_EMOJIS):
+        present = pd.notna(non_featured_ja[:, i])
+        section[present] = (section[present] + f"- {emoji} ["
+                            + non_featured_ja[present, i] + f"](https://bbcamp.info/herodb/hero{i + 1})\n")
+    context['non_featured_section'] = np.where(has_non_featured, section, "")
+
+    if 'Start Time' in display_df.columns:
+        context.update(_start_time_variables(display_df['Start Time'], post_timezone))
+
+    return pd.DataFrame(context, index=display_df.index)
+
+
+def event_template_data(display_row: dict, context_row: dict) -> dict:
+    """Template data for one event: its display columns plus the variables set in its context row."""
+    event_data = dict(display_row)
+    if '_changed_columns' in event_data:
+        event_data['_changed_columns'] = template_changed_columns(event_data['_changed_columns'])
+    event_data.update({key: value for key, value in context_row.items() if value is not None})
+    return event_data
+
+
+# --- Batch Generation ---
+def generate_discord_posts(display_df: pd.DataFrame, template_obj: dict, context_df: pd.DataFrame) -> list:
+    """
+    Renders `template_obj` for every row of a formatted frame (with template hero columns),
+    compiling the template once. `context_df` is build_template_context(display_df, ...).
+    Returns [{"event_name", "start_date_iso", "payload"}, ...] in row order.
+    """
+    compiled = compile_json_template(template_obj)
+    posts = []
+    for display_row, context_row in zip(display_df.to_dict("records"), context_df.to_dict("records")):
+        event_data = event_template_data(display_row, context_row)
+        posts.append({
+            "event_name": event_data.get("Event Name", ""),
+            "start_date_iso": event_data.get("start_date_iso", ""),
+            "payload": compiled.render(event_data),
+        })
+    return posts
+
+
+def posts_to_jsonl(posts: list) -> str:
+    """One compact Discohook payload per line."""
+    return "".join(json.dumps(post["payload"], ensure_ascii=False) + "\n" for post in posts)
+
+
+def posts_to_zip(posts: list) -> bytes:
+    """A zip with one indented JSON file per post, numbered in row order."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, post in enumerate(posts, 1):
+            name = re.sub(r'[^\w\-]+', '_', str(post["event_name"])).strip('_') or "event"
+            archive.writestr(f"{i:03d}_{name}.json", json.dumps(post["payload"], indent=2, ensure_ascii=False))
+    return buffer.getvalue()
 
 
 # --- Main Renderer ---
-def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: dict, timezone: str = "UTC") -> None:
+def _render_discord_batch(filtered_display_df: pd.DataFrame, context_df: pd.DataFrame, selected_template: dict) -> None:
+    """Generates the selected template for every event in the filtered range, with combined downloads."""
+    posts = generate_discord_posts(filtered_display_df, selected_template["template"], context_df)
+    st.success(f"Generated {len(posts)} Discord posts with template '{selected_template['name']}'.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Download JSONL",
+            data=posts_to_jsonl(posts),
+            file_name=f"discord_posts_{date.today().isoformat()}.jsonl",
+            mime="application/jsonl",
+            key="discord_batch_jsonl",
+        )
+    with col2:
+        st.download_button(
+            label="📥 Download ZIP",
+            data=posts_to_zip(posts),
+            file_name=f"discord_posts_{date.today().isoformat()}.zip",
+            mime="application/zip",
+            key="discord_batch_zip",
+        )
+
+    for post in posts:
+        with st.expander(f"{post['start_date_iso']} {post['event_name']}"):
+            st.code(json.dumps(post["payload"], indent=2, ensure_ascii=False), language="json")
+
+
+def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: dict, timezone: str = "UTC",
+                                display_df: pd.DataFrame | None = None) -> None:
     """
     Renders the Discord Post Creator UI inside the main app.
 
     - diff_df_raw: dataframe filtered to changed rows (expects '_diff_status' column)
     - en_map / ja_map: translation maps
     - timezone: formatting timezone to pass to display formatter
+    - display_df: the main page's already formatted frame (same timezone); its changed rows are
+      used instead of formatting diff_df_raw again
     """
     st.header("🤖 Discord Post Creator")
 
@@ -122,13 +261,13 @@ def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map:
             rules = []
 
     # Full dataframe with all columns for templating
-    display_df_all_cols = format_dataframe_for_display(diff_df_raw, rules, en_map, ja_map, timezone=timezone)
+    if display_df is not None:
+        display_df_all_cols = display_df[display_df['_diff_status'] != 'unchanged']
+    else:
+        display_df_all_cols = format_dataframe_for_display(diff_df_raw, rules, en_map, ja_map, timezone=timezone)
     
     # Add template-friendly hero columns (without HTML line breaks)
-    display_df_all_cols['Featured Heroes (EN) Template'] = display_df_all_cols['Featured Heroes (EN)'].str.replace('<br>', ', ')
-    display_df_all_cols['Non-Featured Heroes (EN) Template'] = display_df_all_cols['Non-Featured Heroes (EN)'].str.replace('<br>', ', ')
-    display_df_all_cols['Featured Heroes (JA) Template'] = display_df_all_cols['Featured Heroes (JA)'].str.replace('<br>', '、')
-    display_df_all_cols['Non-Featured Heroes (JA) Template'] = display_df_all_cols['Non-Featured Heroes (JA)'].str.replace('<br>', '、')
+    display_df_all_cols = add_template_hero_columns(display_df_all_cols)
 
     # Date filter
     st.subheader("Filter by Date Range")
@@ -179,11 +318,7 @@ def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map:
         if changed:
             _save_json_file(CONFIG_FILE, config)
 
-        mask = (
-            (display_df_all_cols["Start Time"].dt.date >= start_date_filter)
-            & (display_df_all_cols["Start Time"].dt.date <= end_date_filter)
-        )
-        filtered_display_df = display_df_all_cols[mask]
+        filtered_display_df = filter_by_start_date(display_df_all_cols, start_date_filter, end_date_filter)
     else:
         filtered_display_df = display_df_all_cols
 
@@ -213,6 +348,15 @@ def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map:
         st.info("No events match the selected date range.")
         return
 
+    # Template variables for every event in range at once; picking an event only looks its row up
+    context_df = build_template_context(filtered_display_df, en_map, ja_map)
+
+    generation_mode = st.radio("Generate", ["Single event", "All events in range"], horizontal=True,
+                               key="discord_generation_mode")
+    if generation_mode == "All events in range":
+        _render_discord_batch(filtered_display_df, context_df, selected_template)
+        return
+
     event_options = filtered_display_df["Event Name"].tolist()
     selected_event = st.selectbox(
         "Select an event to generate post for",
@@ -220,156 +364,10 @@ def render_discord_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map:
         key="discord_event_select"
     )
 
-    event_row = filtered_display_df[filtered_display_df["Event Name"] == selected_event].iloc[0]
-    event_data = event_row.to_dict()
-    
-    # Add template variables mapping from display_formatter columns
-    # Map display column names to template variable names
-    template_mapping = {
-        'Event Name': 'event_name',
-        'event_title_en': 'event_title_en',
-        'event_title_ja': 'event_title_ja',
-        'start_date_md': 'start_date_md',
-        'Duration': 'duration_days',
-        'start_date_iso': 'start_date_iso',
-        'end_date_iso': 'end_date_iso',
-        'Featured Heroes (EN)': 'featured_heroes_en',
-        'Non-Featured Heroes (EN)': 'non_featured_heroes_en',
-        'questline': 'questline',
-        'banner': 'banner_url',
-        'url': 'event_url'
-    }
-    
-    # Add mapped variables
-    for display_col, template_var in template_mapping.items():
-        if display_col in event_data:
-            event_data[template_var] = event_data[display_col]
-    
-    # Extract days from duration
-    if 'duration_days' in event_data and isinstance(event_data['duration_days'], str):
-        duration_str = event_data['duration_days']
-        if 'd' in duration_str:
-            days = duration_str.split('d')[0]
-            event_data['duration_days'] = days
+    event_position = event_options.index(selected_event)
+    event_data = event_template_data(filtered_display_df.iloc[event_position].to_dict(),
+                                     context_df.iloc[event_position].to_dict())
     
-    # Extract individual featured heroes - remove HTML <br> tags first
-    if 'featured_heroes_en' in event_data and isinstance(event_data['featured_heroes_en'], str):
-        # Remove HTML <br> tags and split by comma
-        clean_heroes = event_data['featured_heroes_en'].replace('<br>', ', ')
-        heroes = [h.strip() for h in clean_heroes.split(',') if h.strip()]
-        for i, hero in enumerate(heroes[:2], 1):
-            event_data[f'featured_hero_{i}_en'] = hero
-    
-    # Extract individual featured heroes in Japanese
-    if 'Featured Heroes (JA)' in event_data and isinstance(event_data['Featured Heroes (JA)'], str):
-        # Remove HTML <br> tags and split by comma
-        clean_heroes_ja = event_data['Featured Heroes (JA)'].replace('<br>', '、')
-        heroes_ja = [h.strip() for h in clean_heroes_ja.split('、') if h.strip()]
-        for i, hero in enumerate(heroes_ja[:2], 1):
-            event_data[f'featured_hero_{i}_ja'] = hero
-
-    # Extract individual non-featured heroes in Japanese for Discord format
-    if 'Non-Featured Heroes (JA) Template' in event_data and isinstance(event_data['Non-Featured Heroes (JA) Template'], str):
-        non_featured_heroes_ja = event_data['Non-Featured Heroes (JA) Template']
-        if non_featured_heroes_ja and pd.notna(non_featured_heroes_ja) and non_featured_heroes_ja.strip():
-            # Split non-featured heroes and add to event_data
-            non_featured_list = [h.strip() for h in non_featured_heroes_ja.split('、') if h.strip()]
-            for i, hero in enumerate(non_featured_list[:6], 1):  # Max 6 heroes
-                event_data[f'non_featured_hero_{i}_ja'] = hero
-            event_data['has_non_featured_heroes'] = True
-            
-            # Generate non-featured section for Discord template
-            non_featured_section = "**非注目追加**\n"
-            for i, hero in enumerate(non_featured_list[:4], 1):  # Max 4 heroes for display
-                # Assign appropriate emoji based on hero position
-                emoji = "<:emblemice:989041535691673624>"
-                if i == 2:
-                    emoji = "<:emblemholy:989041571167101022>"
-                elif i == 3:
-                    emoji = "<:emblemfire:989041476833017886>"
-                elif i == 4:
-                    emoji = "<:emblemice:989041535691673624>"
-                
-                non_featured_section += f"- {emoji} [{hero}](https://bbcamp.info/herodb/hero{i})\n"
-            event_data['non_featured_section'] = non_featured_section
-        else:
-            event_data['has_non_featured_heroes'] = False
-            event_data['non_featured_section'] = ""
-    else:
-        event_data['has_non_featured_heroes'] = False
-        event_data['non_featured_section'] = ""
-    
-    # Add weekday and time information if Start Time is available
-    if 'Start Time' in event_data and pd.notna(event_data['Start Time']):
-        try:
-            start_date = event_data['Start Time']
-            # Convert Timestamp to datetime object for reliable formatting
-            if hasattr(start_date, 'date'):
-                # Get the date part only
-                date_part = start_date.date()
-                # Japanese weekday names
-                weekdays = ["月", "火", "水", "木", "金", "土", "日"]
-                weekday_num = date_part.weekday()
-                event_data['start_date_weekday'] = weekdays[weekday_num]
-                
-                # Format: 2025/9/20 (火) - manually format to avoid strftime issues
-                year = date_part.year
-                month = date_part.month
-                day = date_part.day
-                event_data['start_date_full'] = f"{year}/{month}/{day} ({event_data['start_date_weekday']})"
-                
-                # Also ensure start_date_iso is properly formatted string
-                if 'start_date_iso' not in event_data or not isinstance(event_data['start_date_iso'], str):
-                    event_data['start_date_iso'] = f"{year}-{month:02d}-{day:02d}"
-                
-                # Add time formatting for Discord (UTC to JST conversion + 12-hour format with AM/PM)
-                if hasattr(start_date, 'time'):
-                    time_part = start_date.time()
-                    hour = time_part.hour
-                    minute = time_part.minute
-                    
-                    # Convert UTC to JST (+9 hours)
-                    jst_hour = (hour + 9) % 24
-                    
-                    # Convert to 12-hour format with AM/PM
-                    if jst_hour == 0:
-                        event_data['start_time_12h'] = f"12:{minute:02d}AM"
-                    elif jst_hour < 12:
-                        event_data['start_time_12h'] = f"{jst_hour}:{minute:02d}AM"
-                    elif jst_hour == 12:
-                        event_data['start_time_12h'] = f"12:{minute:02d}PM"
-                    else:
-                        event_data['start_time_12h'] = f"{jst_hour-12}:{minute:02d}PM"
-                    
-                    # Also add 24-hour format
-                    event_data['start_time_24h'] = f"{jst_hour:02d}:{minute:02d}"
-                    
-        except (ValueError, TypeError, AttributeError) as e:
-            st.error(f"Error processing date: {str(e)}")
-            # Fallback to start_date_iso if available
-            if 'start_date_iso' in event_data and isinstance(event_data['start_date_iso'], str):
-                try:
-                    from datetime import datetime
-                    start_date = datetime.fromisoformat(event_data['start_date_iso'])
-                    weekdays = ["月", "火", "水", "木", "金", "土", "日"]
-                    weekday_num = start_date.weekday()
-                    event_data['start_date_weekday'] = weekdays[weekday_num]
-                    event_data['start_date_full'] = f"{start_date.year}/{start_date.month}/{start_date.day} ({event_data['start_date_weekday']})"
-                except (ValueError, TypeError):
-                    pass
-    else:
-        # Fallback: if Start Time is not available, try to create start_date_full from other date fields
-        if 'start_date_iso' in event_data and isinstance(event_data['start_date_iso'], str):
-            try:
-                from datetime import datetime
-                start_date = datetime.fromisoformat(event_data['start_date_iso'])
-                weekdays = ["月", "火", "水", "木", "金", "土", "日"]
-                weekday_num = start_date.weekday()
-                event_data['start_date_weekday'] = weekdays[weekday_num]
-                event_data['start_date_full'] = f"{start_date.year}/{start_date.month}/{start_date.day} ({event_data['start_date_weekday']})"
-            except (ValueError, TypeError):
-                pass
-
     # Table view (standard columns) - same as forum_post_creator
     st.subheader("Difference Data (Standard View)")
     standard_cols = [
@@ -0,0 +1,367 @@
+# modules/event_store.py
+
+"""
+SQLite store of every snapshot's rows (`data/event_store.sqlite`), for questions that span snapshots
+("when did this unique_id first appear", "how often was it rescheduled") without loading every folder.
+
+Each snapshot is stored once under a snapshot_id; re-storing a folder whose CSV hash did not change
+is a no-op, so `sync_event_store` can run on every new folder. Queries return DataFrames with the
+snapshot schema applied.
+"""
+
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from modules.data_loader import EVENT_BASE_DIR, snapshot_csv_path
+from modules.diff_engine import HERO_COLS_C, HERO_COLS_H, compare_dataframes, with_diff_status
+from modules.diff_spec import load_diff_spec
+from modules.snapshot_cache import SNAPSHOT_CACHE_DIR, apply_snapshot_schema, read_snapshot, snapshot_hash
+from modules.snapshot_catalog import CATALOG_PATH, parse_folder_name, scan_snapshots
+
+# --- Configuration ---
+EVENT_STORE_PATH = Path("data") / "event_store.sqlite"
+# Bump when the table layout changes; the store is then dropped and refilled on the next sync
+EVENT_STORE_SCHEMA_VERSION = 1
+INSERT_BATCH_ROWS = 10_000
+
+HERO_ID_COLUMNS = HERO_COLS_H + HERO_COLS_C
+
+# Snapshot frames hold numpy scalars, which sqlite3 does not bind on its own
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.bool_, bool)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL UNIQUE,
+    version INTEGER,
+    snapshot_date TEXT,
+    sha1 TEXT,
+    rows INTEGER,
+    columns TEXT,
+    stored_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    snapshot_id INTEGER NOT NULL,
+    row_number INTEGER NOT NULL,
+    diff_id TEXT,
+    unique_id TEXT,
+    event TEXT,
+    type TEXT,
+    startDate INTEGER,
+    endDate INTEGER,
+    H1, H2, H3, H4, H5, H6,
+    C1, C2, C3, C4, C5, C6,
+    PRIMARY KEY (snapshot_id, row_number)
+);
+CREATE INDEX IF NOT EXISTS events_diff_id ON events (diff_id, snapshot_id);
+CREATE INDEX IF NOT EXISTS events_unique_id ON events (unique_id, snapshot_id);
+CREATE INDEX IF NOT EXISTS events_start ON events (snapshot_id, startDate);
+""" + "".join(f"CREATE INDEX IF NOT EXISTS events_{col} ON events ({col});\n" for col in HERO_ID_COLUMNS)
+
+# Snapshots in release order (folder date, then version number)
+_SNAPSHOT_ORDER = "s.snapshot_date, s.version, s.folder"
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def connect(store_path=EVENT_STORE_PATH):
+    """Opens the event store, creating (or, after a schema bump, recreating) its tables."""
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(store_path, timeout=30)
+    # Readers (the app) keep working while the watcher stores a new snapshot
+    conn.execute("PRAGMA journal_mode = WAL")
+    with conn:
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version != EVENT_STORE_SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS events")
+            conn.execute("DROP TABLE IF EXISTS snapshots")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {EVENT_STORE_SCHEMA_VERSION}")
+    return conn
+
+
+def _ensure_columns(conn, columns):
+    """Adds snapshot columns the events table does not have yet (e.g. M1..M20, questline, banner)."""
+    existing = {row[1].lower() for row in conn.execute("PRAGMA table_info(events)")}
+    for col in columns:
+        if str(col).lower() not in existing:
+            conn.execute(f"ALTER TABLE events ADD COLUMN {_quote(col)}")
+            existing.add(str(col).lower())
+
+
+def _snapshot_row(conn, folder):
+    """The snapshots entry of `folder` as a dict, or None. (No row factory: pandas reads plain tuples.)"""
+    cursor = conn.execute("SELECT * FROM snapshots WHERE folder = ?", (folder,))
+    row = cursor.fetchone()
+    return None if row is None else dict(zip((d[0] for d in cursor.description), row))
+
+
+def _insert_rows(conn, snapshot_id, df):
+    columns = ["snapshot_id", "row_number"] + list(df.columns)
+    statement = (f"INSERT INTO events ({', '.join(map(_quote, columns))}) "
+                 f"VALUES ({', '.join('?' * len(columns))})")
+    for start in range(0, len(df), INSERT_BATCH_ROWS):
+        batch = df.iloc[start:start + INSERT_BATCH_ROWS].astype(object)
+        batch = batch.where(batch.notna(), None)
+        batch.insert(0, "row_number", np.arange(start, start + len(batch)))
+        batch.insert(0, "snapshot_id", snapshot_id)
+        conn.executemany(statement, batch.to_numpy(dtype=object).tolist())
+
+
+def store_snapshot(folder, base_dir=None, store_path=EVENT_STORE_PATH, cache_dir=SNAPSHOT_CACHE_DIR):
+    """
+    Writes the rows of one snapshot folder into the store, replacing an older copy of the folder.
+    Nothing is read when the stored copy has the CSV's current hash. Returns the snapshot_id,
+    or None without a CSV.
+    """
+    csv_path = snapshot_csv_path(folder, base_dir)
+    if not csv_path.exists():
+        return None
+    sha1 = snapshot_hash(csv_path, cache_dir)
+    with closing(connect(store_path)) as conn:
+        row = _snapshot_row(conn, folder)
+        if row is not None and row["sha1"] == sha1:
+            return row["snapshot_id"]
+
+    df = read_snapshot(csv_path, cache_dir)
+    version, folder_date = parse_folder_name(folder)
+    with closing(connect(store_path)) as conn, conn:
+        row = _snapshot_row(conn, folder)
+        if row is None:
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (folder, version, snapshot_date) VALUES (?, ?, ?)",
+                (folder, version, folder_date)).lastrowid
+        else:
+            snapshot_id = row["snapshot_id"]
+            conn.execute("DELETE FROM events WHERE snapshot_id = ?", (snapshot_id,))
+        _ensure_columns(conn, df.columns)
+        _insert_rows(conn, snapshot_id, df)
+        conn.execute("UPDATE snapshots SET sha1 = ?, rows = ?, columns = ?, stored_at = ? WHERE snapshot_id = ?",
+                     (sha1, len(df), json.dumps([str(col) for col in df.columns]), time.time(), snapshot_id))
+    return snapshot_id
+
+
+def sync_event_store(base_dir=EVENT_BASE_DIR, store_path=EVENT_STORE_PATH, catalog_path=CATALOG_PATH):
+    """Stores every snapshot folder in `base_dir` that is missing or outdated. Returns {folder: snapshot_id}."""
+    stored = {}
+    for folder in scan_snapshots(base_dir, catalog_path):
+        try:
+            snapshot_id = store_snapshot(folder, base_dir, store_path)
+        except Exception as e:
+            print(f"Warning: could not store snapshot {folder}: {e}")
+            continue
+        if snapshot_id is not None:
+            stored[folder] = snapshot_id
+    return stored
+
+
+def is_stored(folder, base_dir=None, store_path=EVENT_STORE_PATH, cache_dir=SNAPSHOT_CACHE_DIR):
+    """True when the store holds `folder` with its CSV's current content."""
+    csv_path = snapshot_csv_path(folder, base_dir)
+    if not csv_path.exists():
+        return False
+    with closing(connect(store_path)) as conn:
+        row = _snapshot_row(conn, folder)
+    return row is not None and row["sha1"] == snapshot_hash(csv_path, cache_dir)
+
+
+def stored_snapshots(store_path=EVENT_STORE_PATH):
+    """One row per stored snapshot (snapshot_id, folder, version, snapshot_date, rows, stored_at), in release order."""
+    with closing(connect(store_path)) as conn:
+        return pd.read_sql_query(
+            "SELECT s.snapshot_id, s.folder, s.version, s.snapshot_date, s.rows, s.stored_at "
+            f"FROM snapshots s ORDER BY {_SNAPSHOT_ORDER}", conn)
+
+
+def _window_condition(date_window, alias="e"):
+    """SQL condition and parameters for rows overlapping (lo, hi); a missing date never excludes a row by itself."""
+    if date_window is None:
+        return "1", []
+    lo, hi = date_window
+    return (f"NOT (COALESCE({alias}.startDate > ?, 0) OR COALESCE({alias}.endDate < ?, 0))", [hi, lo])
+
+
+def _read_rows(conn, snapshot, condition="1", params=()):
+    """Rows of one stored snapshot matching `condition`, with its own columns in CSV order."""
+    columns = json.loads(snapshot["columns"])
+    select = ", ".join(f"e.{_quote(col)}" for col in columns)
+    df = pd.read_sql_query(
+        f"SELECT {select} FROM events e WHERE e.snapshot_id = ? AND {condition} ORDER BY e.row_number",
+        conn, params=[snapshot["snapshot_id"], *params])
+    return apply_snapshot_schema(df)
+
+
+def _require_snapshot(conn, folder):
+    snapshot = _snapshot_row(conn, folder)
+    if snapshot is None:
+        raise LookupError(f"Snapshot not in the event store: {folder}")
+    return snapshot
+
+
+def snapshot_frame(folder, date_window=None, store_path=EVENT_STORE_PATH):
+    """
+    The stored rows of `folder`, as read_snapshot would return them. `date_window` = (lo, hi)
+    snapshot timestamps keeps only rows overlapping it, using the startDate index.
+    """
+    with closing(connect(store_path)) as conn:
+        condition, params = _window_condition(date_window)
+        return _read_rows(conn, _require_snapshot(conn, folder), condition, params)
+
+
+def event_history(unique_id=None, diff_id=None, store_path=EVENT_STORE_PATH):
+    """
+    Every stored version of an event, oldest snapshot first, with the snapshot's folder, version and date.
+    Looked up by unique_id and/or diff_id.
+    """
+    conditions, params = [], []
+    if unique_id is not None:
+        conditions.append("e.unique_id = ?")
+        params.append(str(unique_id).strip())
+    if diff_id is not None:
+        conditions.append("e.diff_id = ?")
+        params.append(str(diff_id))
+    if not conditions:
+        raise ValueError("event_history needs a unique_id or a diff_id")
+    with closing(connect(store_path)) as conn:
+        df = pd.read_sql_query(
+            "SELECT s.folder, s.version, s.snapshot_date, e.* FROM events e "
+            f"JOIN snapshots s USING (snapshot_id) WHERE {' OR '.join(conditions)} "
+            f"ORDER BY {_SNAPSHOT_ORDER}, e.row_number", conn, params=params)
+    df = df.drop(columns=["snapshot_id", "row_number"]).dropna(axis=1, how="all")
+    return apply_snapshot_schema(df)
+
+
+def first_appearances(unique_ids=None, store_path=EVENT_STORE_PATH):
+    """
+    Per unique_id: the first and last snapshot it appears in and the number of snapshots it is in.
+    `unique_ids` limits the result to those IDs.
+    """
+    id_filter, params = "", []
+    if unique_ids is not None:
+        unique_ids = [str(uid).strip() for uid in unique_ids]
+        id_filter = f"AND e.unique_id IN ({', '.join('?' * len(unique_ids))})"
+        params = unique_ids
+    with closing(connect(store_path)) as conn:
+        return pd.read_sql_query(
+            "SELECT unique_id, first_folder, first_snapshot_date, last_folder, snapshots "
+            "FROM (SELECT unique_id, "
+            "             FIRST_VALUE(folder) OVER w AS first_folder, "
+            "             FIRST_VALUE(snapshot_date) OVER w AS first_snapshot_date, "
+            "             LAST_VALUE(folder) OVER w AS last_folder, "
+            "             COUNT(*) OVER w AS snapshots, "
+            "             ROW_NUMBER() OVER w AS position "
+            "      FROM (SELECT DISTINCT e.unique_id, s.folder, s.snapshot_date, s.version "
+            "            FROM events e JOIN snapshots s USING (snapshot_id) "
+            f"            WHERE e.unique_id IS NOT NULL {id_filter}) "
+            "      WINDOW w AS (PARTITION BY unique_id ORDER BY snapshot_date, version, folder "
+            "                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)) "
+            "WHERE position = 1 ORDER BY unique_id", conn, params=params)
+
+
+def reschedule_counts(unique_ids=None, store_path=EVENT_STORE_PATH):
+    """
+    Per unique_id: how many times its startDate changed between consecutive snapshots it appears in
+    (`reschedules`), and the number of distinct start dates it had.
+    """
+    id_filter, params = "", []
+    if unique_ids is not None:
+        unique_ids = [str(uid).strip() for uid in unique_ids]
+        id_filter = f"AND e.unique_id IN ({', '.join('?' * len(unique_ids))})"
+        params = unique_ids
+    with closing(connect(store_path)) as conn:
+        return pd.read_sql_query(
+            "SELECT unique_id, "
+            "       SUM(previous_start IS NOT NULL AND previous_start IS NOT start_date) AS reschedules, "
+            "       COUNT(DISTINCT start_date) AS start_dates "
+            "FROM (SELECT unique_id, start_date, "
+            "             LAG(start_date) OVER (PARTITION BY unique_id ORDER BY snapshot_date, version, folder) "
+            "               AS previous_start "
+            "      FROM (SELECT e.unique_id, s.folder, s.snapshot_date, s.version, MIN(e.startDate) AS start_date "
+            "            FROM events e JOIN snapshots s USING (snapshot_id) "
+            f"            WHERE e.unique_id IS NOT NULL {id_filter} "
+            "            GROUP BY e.unique_id, e.snapshot_id)) "
+            "GROUP BY unique_id ORDER BY unique_id", conn, params=params)
+
+
+def events_with_hero(hero_id, folder=None, store_path=EVENT_STORE_PATH):
+    """Rows featuring `hero_id` in any H/C column, across all snapshots or in `folder` only."""
+    hero_condition = " OR ".join(f"e.{col} = ?" for col in HERO_ID_COLUMNS)
+    params = [hero_id] * len(HERO_ID_COLUMNS)
+    folder_filter = ""
+    if folder is not None:
+        folder_filter = "AND s.folder = ?"
+        params.append(folder)
+    with closing(connect(store_path)) as conn:
+        df = pd.read_sql_query(
+            "SELECT s.folder, s.version, s.snapshot_date, e.* FROM events e "
+            f"JOIN snapshots s USING (snapshot_id) WHERE ({hero_condition}) {folder_filter} "
+            f"ORDER BY {_SNAPSHOT_ORDER}, e.row_number", conn, params=params)
+    df = df.drop(columns=["snapshot_id", "row_number"]).dropna(axis=1, how="all")
+    return apply_snapshot_schema(df)
+
+
+def compare_snapshots(current_folder, previous_folder, date_window=None, store_path=EVENT_STORE_PATH):
+    """
+    compare_dataframes for two stored snapshots, without loading both in full.
+
+    An indexed join on diff_id finds the rows that are identical on every column of the diff spec
+    and whose diff_id occurs once in each snapshot; those are unchanged. Only the remaining rows of
+    both snapshots are loaded and passed to compare_dataframes.
+    """
+    spec = load_diff_spec()
+    with closing(connect(store_path)) as conn:
+        current = _require_snapshot(conn, current_folder)
+        previous = _require_snapshot(conn, previous_folder)
+        window_condition, window_params = _window_condition(date_window)
+
+        # A spec column no stored snapshot has is NULL on both sides, so it never tells rows apart
+        stored_columns = {row[1].lower() for row in conn.execute("PRAGMA table_info(events)")}
+        compared = [col for col in spec.columns if col.lower() in stored_columns]
+        identical = " AND ".join(["1"] + [f"c.{_quote(col)} IS p.{_quote(col)}" for col in compared])
+        single = ("NOT EXISTS (SELECT 1 FROM events d WHERE d.diff_id = {a}.diff_id "
+                  "AND d.snapshot_id = {a}.snapshot_id AND d.row_number != {a}.row_number)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS unchanged_pairs (current_row INTEGER, previous_row INTEGER)")
+        conn.execute("DELETE FROM unchanged_pairs")
+        conn.execute(
+            "INSERT INTO unchanged_pairs "
+            "SELECT c.row_number, p.row_number FROM events c "
+            "JOIN events p ON p.diff_id = c.diff_id AND p.snapshot_id = ? "
+            f"WHERE c.snapshot_id = ? AND c.diff_id IS NOT NULL AND {identical} "
+            f"AND {single.format(a='c')} AND {single.format(a='p')}",
+            (previous["snapshot_id"], current["snapshot_id"]))
+
+        unchanged_df = _read_rows(
+            conn, current, f"e.row_number IN (SELECT current_row FROM unchanged_pairs) AND {window_condition}",
+            window_params)
+        current_df = _read_rows(
+            conn, current, f"e.row_number NOT IN (SELECT current_row FROM unchanged_pairs) AND {window_condition}",
+            window_params)
+        previous_df = _read_rows(
+            conn, previous, f"e.row_number NOT IN (SELECT previous_row FROM unchanged_pairs) AND {window_condition}",
+            window_params)
+
+    parts = []
+    if len(current_df) or len(previous_df):
+        parts.append(compare_dataframes(current_df, previous_df, spec=spec))
+    parts.append(with_diff_status(unchanged_df.assign(original_startDate=np.nan), 'unchanged', spec))
+    # Same start-time order as compare_dataframes; the date filter relies on it
+    return pd.concat(parts, ignore_index=True).sort_values('startDate', na_position='last', kind='stable')
+
+
+# For maintenance: python -m modules.event_store stores every snapshot folder not yet in the store
+if __name__ == "__main__":
+    started = time.perf_counter()
+    stored = sync_event_store()
+    print(f"{len(stored)} snapshots in {EVENT_STORE_PATH} ({time.perf_counter() - started:.1f}s)")
+    print(stored_snapshots().to_string(index=False))
@@ -5,7 +5,9 @@ import re
 from pathlib import Path
 from datetime import date
 
-from modules.display_formatter import format_dataframe_for_display, to_html_table
+from modules.display_formatter import (format_dataframe_for_display, filter_by_start_date, to_html_table,
+                                       add_template_hero_columns, template_changed_columns)
+from modules.template_engine import render_template
 
 
 # --- Config Helpers ---
@@ -50,35 +52,62 @@ def load_template(template_path: Path | None = None) -> dict:
 
 # --- Template Processor ---
 def process_custom_template(template_str: str, data_dict: dict) -> str:
-    output = ""
-    i = 0
-    while i < len(template_str):
-        char = template_str[i]
-        if char == "\\":  # Escape character
-            if i + 1 < len(template_str):
-                output += template_str[i + 1]
-                i += 2
-            else:
-                output += char
-                i += 1
-        elif char == "{":
-            end_brace = template_str.find("}", i)
-            if end_brace != -1:
-                key = template_str[i + 1 : end_brace]
-                value = data_dict.get(key)
-                if value is not None:
-                    output += str(value) if pd.notna(value) else ""
-                else:
-                    # If key not found, keep literal text
-                    output += f"{{{key}}}"
-                i = end_brace + 1
-            else:
-                output += char
-                i += 1
-        else:
-            output += char
-            i += 1
-    return output
+    return render_template(template_str, data_dict)
+
+
+def render_forum_texts(template_data: dict, templates: dict) -> tuple[str, str]:
+    """EN and JA post text for one formatted event row, using the `<status>_en` / `<status>_ja` templates."""
+    template_data = dict(template_data)
+    if '_changed_columns' in template_data:
+        template_data['_changed_columns'] = template_changed_columns(template_data['_changed_columns'])
+    status = template_data.get("_diff_status", "unchanged")
+    en_template_key = f"{status}_en"
+    ja_template_key = f"{status}_ja"
+
+    en_template_str = templates.get(en_template_key, f"**English template for '{status}' not found.**")
+    ja_template_str = templates.get(ja_template_key, f"**Japanese template for '{status}' not found.**")
+
+    # テンプレート処理前にDisplay Typeをevent_titleで上書き（後方互換性のため）
+    if 'event_title_en' in template_data:
+        template_data['Display Type'] = template_data['event_title_en']
+    
+    en_text = process_custom_template(en_template_str, template_data)
+    ja_text = process_custom_template(ja_template_str, template_data)
+    
+    # 日本語テンプレートではDisplay Typeを日本語イベント名で上書き
+    if 'event_title_ja' in template_data:
+        ja_template_data = template_data.copy()
+        ja_template_data['Display Type'] = ja_template_data['event_title_ja']
+        ja_text = process_custom_template(ja_template_str, ja_template_data)
+
+    # Non-Featured Heroesがある場合に追加テキストを付加
+    non_featured_en = template_data.get('Non-Featured Heroes (EN) Template', '')
+    non_featured_ja = template_data.get('Non-Featured Heroes (JA) Template', '')
+    
+    if non_featured_en and pd.notna(non_featured_en) and non_featured_en.strip():
+        en_text += f" + Non featured heroes {non_featured_en}"
+    
+    if non_featured_ja and pd.notna(non_featured_ja) and non_featured_ja.strip():
+        ja_text += f" + 非注目 {non_featured_ja}"
+
+    return en_text, ja_text
+
+
+def generate_forum_posts(display_df: pd.DataFrame, templates: dict) -> list:
+    """
+    Post texts for every row of a formatted frame (with template hero columns), in row order:
+    [{"event_name", "status", "en", "ja"}, ...].
+    """
+    posts = []
+    for template_data in display_df.to_dict("records"):
+        en_text, ja_text = render_forum_texts(template_data, templates)
+        posts.append({
+            "event_name": template_data.get("Event Name", ""),
+            "status": template_data.get("_diff_status", ""),
+            "en": en_text,
+            "ja": ja_text,
+        })
+    return posts
 
 
 # --- Main Renderer ---
@@ -112,10 +141,7 @@ def render_forum_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: d
     display_df_all_cols = format_dataframe_for_display(diff_df_raw, rules, en_map, ja_map, timezone=timezone)
     
     # Add template-friendly hero columns (without HTML line breaks)
-    display_df_all_cols['Featured Heroes (EN) Template'] = display_df_all_cols['Featured Heroes (EN)'].str.replace('<br>', ', ')
-    display_df_all_cols['Non-Featured Heroes (EN) Template'] = display_df_all_cols['Non-Featured Heroes (EN)'].str.replace('<br>', ', ')
-    display_df_all_cols['Featured Heroes (JA) Template'] = display_df_all_cols['Featured Heroes (JA)'].str.replace('<br>', '、')
-    display_df_all_cols['Non-Featured Heroes (JA) Template'] = display_df_all_cols['Non-Featured Heroes (JA)'].str.replace('<br>', '、')
+    display_df_all_cols = add_template_hero_columns(display_df_all_cols)
 
     # Date filter
     st.subheader("Filter by Date Range")
@@ -166,11 +192,7 @@ def render_forum_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: d
         if changed:
             _save_json_file(CONFIG_FILE, config)
 
-        mask = (
-            (display_df_all_cols["Start Time"].dt.date >= start_date_filter)
-            & (display_df_all_cols["Start Time"].dt.date <= end_date_filter)
-        )
-        filtered_display_df = display_df_all_cols[mask]
+        filtered_display_df = filter_by_start_date(display_df_all_cols, start_date_filter, end_date_filter)
     else:
         filtered_display_df = display_df_all_cols
 
@@ -224,13 +246,6 @@ def render_forum_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: d
 
     for index, row in filtered_display_df.iterrows():
         st.markdown(f"--- Event: **{row.get('Event Name', '')}** (`{row.get('_diff_status', '')}`) ---")
-        status = row.get("_diff_status", "unchanged")
-        en_template_key = f"{status}_en"
-        ja_template_key = f"{status}_ja"
-
-        en_template_str = templates.get(en_template_key, f"**English template for '{status}' not found.**")
-        ja_template_str = templates.get(ja_template_key, f"**Japanese template for '{status}' not found.**")
-
         template_data = row.to_dict()
         
         # デバッグ: 利用可能なテンプレート変数を表示
@@ -240,28 +255,7 @@ def render_forum_post_creator(diff_df_raw: pd.DataFrame, en_map: dict, ja_map: d
                 if key.startswith('event_title') or key in ['Event Name', 'Display Type', 'start_date_iso', 'end_date_iso', 'Duration']:
                     st.write(f"- `{key}`: `{value}` (type: {type(value).__name__})")
         
-        # テンプレート処理前にDisplay Typeをevent_titleで上書き（後方互換性のため）
-        if 'event_title_en' in template_data:
-            template_data['Display Type'] = template_data['event_title_en']
-        
-        en_text = process_custom_template(en_template_str, template_data)
-        ja_text = process_custom_template(ja_template_str, template_data)
-        
-        # 日本語テンプレートではDisplay Typeを日本語イベント名で上書き
-        if 'event_title_ja' in template_data:
-            ja_template_data = template_data.copy()
-            ja_template_data['Display Type'] = ja_template_data['event_title_ja']
-            ja_text = process_custom_template(ja_template_str, ja_template_data)
-
-        # Non-Featured Heroesがある場合に追加テキストを付加
-        non_featured_en = row.get('Non-Featured Heroes (EN) Template', '')
-        non_featured_ja = row.get('Non-Featured Heroes (JA) Template', '')
-        
-        if non_featured_en and pd.notna(non_featured_en) and non_featured_en.strip():
-            en_text += f" + Non featured heroes {non_featured_en}"
-        
-        if non_featured_ja and pd.notna(non_featured_ja) and non_featured_ja.strip():
-            ja_text += f" + 非注目 {non_featured_ja}"
+        en_text, ja_text = render_forum_texts(template_data, templates)
 
         all_en_texts.append(en_text)
         all_ja_texts.append(ja_text)
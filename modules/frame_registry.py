@@ -0,0 +1,157 @@
+# modules/frame_registry.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# --- Configuration ---
+REGISTRY_MAX_BYTES = 1024 * 1024 * 1024
+# A session that disappears never releases its references; after this long unused they stop pinning
+REGISTRY_MAX_IDLE_SECONDS = 60 * 60
+
+
+def _value_nbytes(value):
+    """
+    Approximate memory held by a cached value. Object and string columns are measured deeply (the
+    formatted frames are mostly such columns), so this is computed once, when the value is inserted.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(pd.Series(value.memory_usage(index=True, deep=True)).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_value_nbytes(item) for item in value.values())
+    if isinstance(value, str):
+        return len(value)
+    return 0
+
+
+class _Entry:
+    __slots__ = ('value', 'nbytes', 'refs', 'last_used')
+
+    def __init__(self, value, nbytes):
+        self.value = value
+        self.nbytes = nbytes
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+
+class FrameRegistry:
+    """
+    Process-wide store of immutable frames (snapshots, diffs, formatted frames) shared by every
+    Streamlit session and module without copying or pickling.
+
+    Values handed out are shared: callers must treat them as read-only and copy before mutating.
+    acquire/release keep an entry pinned while a session uses it; unpinned entries are evicted
+    least recently used first once the registry exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=REGISTRY_MAX_BYTES, max_idle_seconds=REGISTRY_MAX_IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_idle_seconds = max_idle_seconds
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory=None):
+        """
+        Returns the value for `key`, building it with `factory()` on a miss.
+        Concurrent misses on the same key build it once.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                return entry.value
+            if factory is None:
+                return None
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            try:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._touch(key, entry)
+                        return entry.value
+                value = factory()
+                # Measured outside the registry lock; deep sizes are not free
+                entry = _Entry(value, _value_nbytes(value))
+                with self._lock:
+                    self._entries[key] = entry
+                    self._evict()
+                return value
+            finally:
+                # Also when the factory raised, so failed keys do not leave their lock behind
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+
+    def acquire(self, key, factory=None):
+        """Like get(), but pins the entry until a matching release()."""
+        value = self.get(key, factory)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key].refs += 1
+        return value
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            self._evict()
+
+    def pinned(self, slot):
+        """Values of the entries under `slot` (the first item of their key) that a live session holds."""
+        now = time.monotonic()
+        with self._lock:
+            return [entry.value for key, entry in self._entries.items()
+                    if isinstance(key, tuple) and key[:1] == (slot,)
+                    and entry.refs > 0 and now - entry.last_used < self.max_idle_seconds]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(e.nbytes for e in self._entries.values()),
+                'pinned': sum(1 for e in self._entries.values() if e.refs > 0),
+            }
+
+    def _touch(self, key, entry):
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+
+    def _evict(self):
+        total = sum(e.nbytes for e in self._entries.values())
+        now = time.monotonic()
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs > 0 and now - entry.last_used < self.max_idle_seconds:
+                continue
+            total -= entry.nbytes
+            del self._entries[key]
+
+
+# Shared by every session in this process (modules are imported once per Streamlit server)
+registry = FrameRegistry()
+
+
+def session_acquire(session_state, slot, key, factory=None):
+    """
+    Pins `key` for one Streamlit session under `slot` (e.g. 'comparison'), releasing whatever
+    that slot held before, and returns the shared value.
+    """
+    held = session_state.setdefault('_registry_keys', {})
+    previous = held.get(slot)
+    if previous == key:
+        return registry.get(key, factory)
+    value = registry.acquire(key, factory)
+    held[slot] = key
+    if previous is not None:
+        registry.release(previous)
+    return value
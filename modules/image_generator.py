@@ -14,7 +14,9 @@ from io import BytesIO
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from modules.data_loader import load_all_data
+from modules.data_loader import snapshot_csv_path
+from modules.frame_registry import registry
+from modules.snapshot_cache import read_snapshot, snapshot_hash
 
 # 定数はdata_loaderからインポートした方が良いが、一旦ここで定義
 GCP_CREDS_PATH = "client_secret.json"
@@ -81,8 +83,11 @@ def generate_image(params):
 
     # 共通のデータ読み込み
     hero_master_df = _load_hero_master_data()
-    data = load_all_data(data_dir, "")
-    main_df = data['main_df']
+    # 共有レジストリからスナップショットを取得（Drive からの再ダウンロードや再パースは不要）
+    csv_path = snapshot_csv_path(data_dir)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Event CSV file not found: {csv_path}")
+    main_df = registry.get(('snapshot', snapshot_hash(csv_path)), lambda: read_snapshot(csv_path))
     
     target_row = main_df[main_df['event'] == event_id].iloc[0]
     m_cols = [f'M{i}' for i in range(1, 21)]
@@ -0,0 +1,172 @@
+# modules/pipeline.py
+
+"""
+Main page pipeline: load → diff → format (static, then time) → filter → render.
+
+The comparison (load + diff + translation maps) is keyed on the content of its sources and persisted
+in the result cache, so anything that builds it ahead of time (e.g. the snapshot watcher) warms the
+app's first load.
+
+Every stage is memoized in the shared frame registry under a key built from the keys of its
+inputs, so a rerun only recomputes the stages whose inputs changed:
+- rule matching and hero translation run once per snapshot pair, load window and rules; the date
+  filter is not part of any stage key, and the load window only moves when the filter leaves the
+  whole months already loaded (see load_window),
+- a timezone switch only redoes the time-derived columns,
+- a date range change inside the loaded months only re-slices the cached formatted frame
+  (filter_by_start_date) and re-renders the table; one outside them loads a wider window,
+- paging only renders the rows of the visible page, and the client-side table payload is built
+  once per filtered frame (column toggling and sorting then happen in the browser).
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+
+from modules.display_formatter import (add_static_display_columns, add_time_display_columns,
+                                       filter_by_start_date, index_start_times, page_bounds, to_html_table)
+from modules.calendar_table import calendar_table_payload, publish_payload
+from modules.data_loader import load_all_data, load_hero_data, source_fingerprints
+from modules.diff_engine import compare_dataframes, with_diff_status, DIFF_ENGINE_VERSION, FINGERPRINT_COLUMN
+from modules.diff_spec import load_diff_spec
+from modules.event_store import EVENT_STORE_PATH, compare_snapshots, is_stored
+from modules.frame_registry import registry, session_acquire
+from modules.result_cache import result_cache_key, load_cached_result, store_cached_result
+from modules.snapshot_cache import snapshot_date_window
+from modules.translation_engine import create_translation_dicts
+
+def _month_bounds(first, last):
+    """First day of `first`'s month and last day of `last`'s month."""
+    next_month = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+    return first.replace(day=1), next_month - timedelta(days=1)
+
+def load_window(config, current=(None, None)):
+    """
+    (window_start, window_end) ISO dates to load: whole months around the main page's date filter and
+    the post creators' range, as saved in config.json. (None, None) loads whole snapshots.
+
+    The window is part of the comparison key, so it only moves when it has to: `current` (the window
+    already loaded) is returned as is while it still covers the requested range.
+    """
+    window_dates = [date.fromisoformat(str(config[key]))
+                    for key in ('filter_start_date', 'filter_end_date', 'post_start', 'post_end')
+                    if config.get(key)]
+    if not window_dates:
+        return None, None
+    first, last = min(window_dates), max(window_dates)
+    current_start, current_end = current
+    if current_start and current_end and current_start <= first.isoformat() and last.isoformat() <= current_end:
+        return current_start, current_end
+    window_start, window_end = _month_bounds(first, last)
+    return window_start.isoformat(), window_end.isoformat()
+
+def comparison_pair_key(latest_folder, diff_folder, base_dir=None):
+    """Key of a snapshot pair's content: source content hashes, diff engine version and diff spec."""
+    return result_cache_key(source_fingerprints(latest_folder, diff_folder, base_dir), DIFF_ENGINE_VERSION,
+                            load_diff_spec().key)
+
+def comparison_cache_key(latest_folder, diff_folder, window_start=None, window_end=None, base_dir=None):
+    """Result cache key of a comparison: the pair key (see comparison_pair_key) and the load window."""
+    return result_cache_key(comparison_pair_key(latest_folder, diff_folder, base_dir), window_start, window_end)
+
+def build_comparison(cache_key, latest_folder, diff_folder, window_start=None, window_end=None, base_dir=None,
+                     store_path=EVENT_STORE_PATH):
+    """
+    (comparison_df, en_map, ja_map) for a snapshot pair, from the result cache or built and stored there.
+    Snapshot folders are looked up under `base_dir` (EVENT_BASE_DIR by default).
+
+    The diff runs in the event store when both snapshots are already stored there (they are written in
+    the background, see SnapshotWatcher.store_in_background), and on the loaded frames otherwise.
+    """
+    cached = load_cached_result(cache_key)
+    if cached is not None:
+        return cached
+
+    date_range = (window_start, window_end) if window_start and window_end else None
+    if diff_folder and is_stored(latest_folder, base_dir, store_path) and is_stored(diff_folder, base_dir, store_path):
+        # Both snapshots are in the event store: unchanged rows are found by an indexed join there
+        date_window = snapshot_date_window(*date_range) if date_range else None
+        comparison_df = compare_snapshots(latest_folder, diff_folder, date_window=date_window, store_path=store_path)
+        en_map, ja_map = create_translation_dicts(*load_hero_data(hero_master_ttl=None))
+        store_cached_result(cache_key, (comparison_df, en_map, ja_map))
+        return comparison_df, en_map, ja_map
+
+    # The hero master was refreshed on Load Data (or by the watcher); the cache key hashed the local copy
+    data = load_all_data(latest_folder, diff_folder, date_range=date_range, hero_master_ttl=None, base_dir=base_dir)
+    
+    comparison_df = None
+    if data['diff_df'] is not None:
+        comparison_df = compare_dataframes(data['main_df'], data['diff_df'])
+    else:
+        # Same start-time order as compare_dataframes; the date filter relies on it
+        comparison_df = with_diff_status(
+            data['main_df'].drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+            .sort_values('startDate', na_position='last', kind='stable'), 'unchanged')
+
+    en_map, ja_map = create_translation_dicts(data['hero_master_df'], data['g_sheet_df'])
+    
+    store_cached_result(cache_key, (comparison_df, en_map, ja_map))
+    return comparison_df, en_map, ja_map
+
+def _run_stage(key, build, session_state=None):
+    if session_state is not None:
+        return session_acquire(session_state, key[0], key, build)
+    return registry.get(key, build)
+
+def static_format_stage(pair_key, window, comparison_df, rules, en_map, ja_map, session_state=None):
+    """
+    Rule outputs and translated hero columns of the comparison loaded for `pair_key` and `window`
+    (see load_window); independent of timezone and of the date filter.
+    """
+    key = ('format_static', pair_key, tuple(window), result_cache_key(rules))
+    return key, _run_stage(
+        key, lambda: add_static_display_columns(comparison_df, rules, en_map, ja_map), session_state)
+
+def time_format_stage(static_key, static_df, timezone, session_state=None):
+    """
+    Start/End Time and the other timezone-dependent columns on top of the static stage, sorted and
+    indexed by Start Time once here so the date filter never scans the frame.
+    """
+    key = ('format_time', static_key, timezone)
+    return key, _run_stage(
+        key, lambda: index_start_times(add_time_display_columns(static_df, timezone)), session_state)
+
+def filter_stage(display_key, display_df, start_date, end_date):
+    """Rows whose Start Time falls on start_date..end_date (inclusive) in the frame's timezone."""
+    key = ('filter', display_key, str(start_date), str(end_date))
+    return key, filter_by_start_date(display_df, start_date, end_date)
+
+def _table_frame(df):
+    """Copy of `df` with Start/End Time as display strings."""
+    table_df = df.copy()
+    dt_format = "%Y-%m-%d %H:%M"
+    for col in ['Start Time', 'End Time']:
+        if col in table_df.columns and pd.api.types.is_datetime64_any_dtype(table_df[col]):
+            table_df[col] = table_df[col].dt.strftime(dt_format)
+    return table_df
+
+def render_stage(filter_key, filtered_df, header_labels, columns, data_dir=None, session_state=None,
+                 page_size=None, page=0):
+    """HTML table for one page of the filtered rows (all of them without `page_size`) and the selected columns."""
+    start, stop, page, _ = page_bounds(len(filtered_df), page_size, page)
+    key = ('render', filter_key, tuple(columns), result_cache_key(header_labels), data_dir, page_size, page)
+
+    def _render():
+        table_df = _table_frame(filtered_df.iloc[start:stop])
+        return to_html_table(table_df, header_labels, columns_to_display=list(columns), data_dir=data_dir)
+
+    return key, _run_stage(key, _render, session_state)
+
+def table_payload_stage(filter_key, filtered_df, header_labels, columns, data_dir=None, session_state=None):
+    """
+    (payload_id, payload): JSON for the client-side table (every filtered row and every column in
+    `columns`) and its content hash. Built, hashed and published once per filtered frame, so a rerun
+    only hands the id to render_calendar_table and the browser downloads the rows once.
+    """
+    key = ('table_payload', filter_key, tuple(columns), result_cache_key(header_labels), data_dir)
+
+    def _build():
+        payload = calendar_table_payload(_table_frame(filtered_df), header_labels, list(columns), data_dir)
+        return publish_payload(payload), payload
+
+    return key, _run_stage(key, _build, session_state)
@@ -0,0 +1,63 @@
+# modules/result_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import pandas as pd
+from pathlib import Path
+
+# --- Configuration ---
+RESULT_CACHE_DIR = Path("data") / "result_cache"
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def result_cache_key(*parts):
+    """Stable key for a processing result from JSON-serializable inputs (hashes, versions, dates)."""
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+def _entry_path(key, cache_dir):
+    return Path(cache_dir) / f"{key}.pkl"
+
+def load_cached_result(key, cache_dir=RESULT_CACHE_DIR):
+    """
+    Returns the stored result for `key`, or None. A hit refreshes the entry's mtime,
+    which is what eviction orders by.
+    """
+    path = _entry_path(key, cache_dir)
+    if not path.exists():
+        return None
+    try:
+        result = pd.read_pickle(path)
+    except Exception as e:
+        print(f"Discarding unreadable result cache entry {path.name}: {e}")
+        path.unlink(missing_ok=True)
+        return None
+    os.utime(path)
+    return result
+
+def store_cached_result(key, result, cache_dir=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+    """Writes `result` atomically under `key`, then evicts least recently used entries above `max_bytes`."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=f".{path.name}.", delete=False) as fh:
+        tmp_path = fh.name
+    try:
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict_result_cache(cache_dir, max_bytes, keep=path)
+
+def evict_result_cache(cache_dir=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES, keep=None):
+    """Removes the least recently used entries until the cache fits in `max_bytes`."""
+    entries = sorted(Path(cache_dir).glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for path in entries:
+        if total <= max_bytes:
+            break
+        if keep is not None and path == keep:
+            continue
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
@@ -0,0 +1,228 @@
+# modules/snapshot_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from pathlib import Path
+
+from modules.diff_engine import FINGERPRINT_COLUMN, row_fingerprints
+from modules.diff_spec import load_diff_spec
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it snapshots are parsed from CSV every time
+    pa = None
+    feather = None
+
+# --- Configuration ---
+SNAPSHOT_CACHE_DIR = Path("data") / "snapshot_cache"
+# Bump when the schema or the cached file layout changes; older entries are then re-ingested
+SCHEMA_VERSION = 2
+
+DATE_COLUMNS = ['startDate', 'endDate']
+HERO_ID_COLUMNS = ([f'H{i}' for i in range(1, 7)] + [f'C{i}' for i in range(1, 7)]
+                   + [f'M{i}' for i in range(1, 21)])
+STRING_ID_COLUMNS = ['diff_id', 'unique_id', 'event', 'type']
+
+# Snapshot dates are seconds since 2000-01-01 UTC
+SNAPSHOT_EPOCH_OFFSET = 946684800
+# Extra days loaded around a date window so events that moved across its edge still pair up in the diff
+WINDOW_MARGIN_DAYS = 14
+CSV_CHUNK_ROWS = 50_000
+
+def file_sha1(filepath):
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def apply_snapshot_schema(df):
+    """
+    Applies the fixed snapshot schema: integer POSIX dates (float only when a date is missing),
+    categorical hero ID columns and plain string IDs.
+    """
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            df[col] = values.astype('int64') if values.notna().all() else values.astype('float64')
+    for col in HERO_ID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in STRING_ID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(object)
+    return df
+
+def snapshot_date_window(start_date, end_date, margin_days=WINDOW_MARGIN_DAYS):
+    """
+    Converts an inclusive date range into (lo, hi) snapshot timestamps, widened by `margin_days`
+    on both sides. The extra day on the high side covers timezones ahead of UTC.
+    """
+    lo = date.fromisoformat(str(start_date)) - timedelta(days=margin_days + 1)
+    hi = date.fromisoformat(str(end_date)) + timedelta(days=margin_days + 2)
+    epoch = date(2000, 1, 1)
+    return (lo - epoch).days * 86400, (hi - epoch).days * 86400
+
+def _window_mask(start_values, end_values, date_window):
+    """Rows whose [startDate, endDate] overlaps the window; a missing date never excludes a row by itself."""
+    lo, hi = date_window
+    start_values = np.asarray(start_values, dtype='float64')
+    end_values = np.asarray(end_values, dtype='float64')
+    return ~((start_values > hi) | (end_values < lo))
+
+def filter_date_window(df, date_window):
+    if date_window is None or not set(DATE_COLUMNS) <= set(df.columns):
+        return df
+    mask = _window_mask(pd.to_numeric(df['startDate'], errors='coerce'),
+                        pd.to_numeric(df['endDate'], errors='coerce'), date_window)
+    return df[mask]
+
+def _read_csv_windowed(csv_path, date_window):
+    """Streams the CSV in chunks and keeps only rows overlapping the window."""
+    chunks = [filter_date_window(chunk, date_window)
+              for chunk in pd.read_csv(csv_path, chunksize=CSV_CHUNK_ROWS)]
+    return apply_snapshot_schema(pd.concat(chunks, ignore_index=True))
+
+def _with_fingerprints(df, fingerprints):
+    return df if fingerprints else df.drop(columns=FINGERPRINT_COLUMN, errors='ignore')
+
+def snapshot_cache_paths(csv_path, cache_dir=SNAPSHOT_CACHE_DIR):
+    """(columnar data path, metadata path) of a snapshot's cache entry."""
+    stem = Path(csv_path).stem
+    return Path(cache_dir) / f"{stem}.feather", Path(cache_dir) / f"{stem}.meta.json"
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+def _save_meta(meta_path, meta):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+def _source_key(csv_path):
+    stat = Path(csv_path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _cached_meta(csv_path, cache_dir):
+    """
+    Returns the cache metadata if the cached copy still matches the source, else None.
+    size+mtime are checked first; only when they moved is the file hashed, so a touched
+    but unchanged snapshot keeps its cache entry. Fingerprints hash the diff spec's groups,
+    so an entry written under another diff spec is stale too.
+    """
+    data_path, meta_path = snapshot_cache_paths(csv_path, cache_dir)
+    meta = _load_meta(meta_path)
+    if (meta.get("schema_version") != SCHEMA_VERSION or meta.get("diff_spec") != load_diff_spec().key
+            or not data_path.exists()):
+        return None
+    source_key = _source_key(csv_path)
+    if all(meta.get(k) == v for k, v in source_key.items()):
+        return meta
+    if meta.get("size") == source_key["size"] and meta.get("sha1") == file_sha1(csv_path):
+        meta.update(source_key)
+        _save_meta(meta_path, meta)
+        return meta
+    return None
+
+def ingest_snapshot(csv_path, cache_dir=SNAPSHOT_CACHE_DIR, fingerprints=False):
+    """
+    Parses a calendar-export CSV once, applies the snapshot schema, computes the row fingerprints
+    and writes both to the cache. Returns the typed DataFrame (with FINGERPRINT_COLUMN if `fingerprints`).
+    """
+    df = apply_snapshot_schema(pd.read_csv(csv_path))
+    if feather is None:
+        return df
+    spec = load_diff_spec()
+    df[FINGERPRINT_COLUMN] = row_fingerprints(df, spec)
+
+    data_path, meta_path = snapshot_cache_paths(csv_path, cache_dir)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    source_key = _source_key(csv_path)
+    with tempfile.NamedTemporaryFile(dir=data_path.parent, prefix=f".{data_path.name}.", delete=False) as fh:
+        tmp_path = fh.name
+    try:
+        feather.write_feather(df, tmp_path)
+        os.replace(tmp_path, data_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _save_meta(meta_path, {
+        "schema_version": SCHEMA_VERSION,
+        "diff_spec": spec.key,
+        "source": str(csv_path),
+        "sha1": file_sha1(csv_path),
+        "rows": len(df),
+        **source_key,
+    })
+    return _with_fingerprints(df, fingerprints)
+
+def read_snapshot(csv_path, cache_dir=SNAPSHOT_CACHE_DIR, date_window=None, fingerprints=False):
+    """
+    Reads a calendar-export snapshot, memory-mapping the cached columnar copy when it is current
+    and (re-)ingesting the CSV otherwise.
+
+    `date_window` = (lo, hi) snapshot timestamps (see snapshot_date_window) keeps only rows whose
+    startDate..endDate overlaps it. On the cached copy the filter runs on the Arrow table,
+    so rows outside the window are never converted to pandas.
+
+    `fingerprints=True` adds the per-row FINGERPRINT_COLUMN stored with the cached copy, which
+    lets compare_dataframes skip unchanged rows. Without pyarrow there is no cached copy and
+    no fingerprints; the diff then compares every matched row.
+    """
+    if feather is None:
+        if date_window is None:
+            return apply_snapshot_schema(pd.read_csv(csv_path))
+        return _read_csv_windowed(csv_path, date_window)
+
+    if _cached_meta(csv_path, cache_dir) is None:
+        df = ingest_snapshot(csv_path, cache_dir, fingerprints=fingerprints)
+        return filter_date_window(df, date_window).reset_index(drop=True)
+
+    data_path, _ = snapshot_cache_paths(csv_path, cache_dir)
+    table = feather.read_table(data_path, memory_map=True)
+    if not fingerprints:
+        table = table.select([name for name in table.column_names if name != FINGERPRINT_COLUMN])
+    if date_window is not None and set(DATE_COLUMNS) <= set(table.column_names):
+        mask = _window_mask(table.column('startDate').to_numpy(zero_copy_only=False),
+                            table.column('endDate').to_numpy(zero_copy_only=False), date_window)
+        table = table.filter(pa.array(mask))
+    # Re-applying the schema is a no-op except for restoring plain object string IDs
+    return apply_snapshot_schema(table.to_pandas())
+
+def snapshot_hash(csv_path, cache_dir=SNAPSHOT_CACHE_DIR):
+    """Content hash of a snapshot CSV, taken from the cache metadata when it is still current."""
+    meta = _cached_meta(csv_path, cache_dir) if feather is not None else None
+    return meta["sha1"] if meta else file_sha1(csv_path)
+
+def snapshot_summary(csv_path, cache_dir=SNAPSHOT_CACHE_DIR):
+    """
+    {"sha1", "rows", "min_start", "max_start"} of a snapshot (startDate as snapshot timestamps).
+    Ingests the CSV if needed; otherwise only the startDate column of the cached copy is read.
+    """
+    if feather is None:
+        start_values = pd.to_numeric(pd.read_csv(csv_path, usecols=['startDate'])['startDate'], errors='coerce')
+        sha1, rows = file_sha1(csv_path), len(start_values)
+    else:
+        meta = _cached_meta(csv_path, cache_dir)
+        if meta is None:
+            ingest_snapshot(csv_path, cache_dir)
+            meta = _cached_meta(csv_path, cache_dir)
+        data_path, _ = snapshot_cache_paths(csv_path, cache_dir)
+        table = feather.read_table(data_path, columns=['startDate'], memory_map=True)
+        start_values = pd.Series(table.column('startDate').to_numpy(zero_copy_only=False), dtype='float64')
+        sha1, rows = meta["sha1"], meta["rows"]
+    return {
+        "sha1": sha1,
+        "rows": rows,
+        "min_start": None if start_values.isna().all() else int(start_values.min()),
+        "max_start": None if start_values.isna().all() else int(start_values.max()),
+    }
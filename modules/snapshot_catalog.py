@@ -0,0 +1,240 @@
+# modules/snapshot_catalog.py
+
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+
+from modules.data_loader import EVENT_BASE_DIR, snapshot_csv_path
+from modules.snapshot_cache import (SNAPSHOT_CACHE_DIR, SNAPSHOT_EPOCH_OFFSET, snapshot_cache_paths,
+                                    snapshot_summary)
+
+# --- Configuration ---
+CATALOG_PATH = Path("data") / "snapshot_catalog.sqlite"
+# The old folder history; imported into the catalog the first time it is opened
+LEGACY_HISTORY_FILE = Path("data") / ".history_event.log"
+# Bump when the table layout changes; the catalog is then rebuilt (only load order is carried over)
+CATALOG_SCHEMA_VERSION = 1
+SNAPSHOT_FOLDER_PATTERN = re.compile(r"^V(\d+)R-(\d{4}-\d{2}-\d{2})$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    folder TEXT PRIMARY KEY,
+    version INTEGER,
+    snapshot_date TEXT,
+    path TEXT,
+    present INTEGER NOT NULL DEFAULT 1,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha1 TEXT,
+    rows INTEGER,
+    min_start_date TEXT,
+    max_start_date TEXT,
+    cache_path TEXT,
+    cache_meta_path TEXT,
+    scanned_at REAL,
+    ingested_at REAL,
+    loaded_at REAL
+);
+CREATE INDEX IF NOT EXISTS snapshots_loaded ON snapshots (loaded_at);
+CREATE INDEX IF NOT EXISTS snapshots_order ON snapshots (snapshot_date, version);
+"""
+
+
+def parse_folder_name(folder):
+    """(version, 'YYYY-MM-DD') for a `V<version>R-YYYY-MM-DD` snapshot folder, else (None, None)."""
+    match = SNAPSHOT_FOLDER_PATTERN.match(folder or "")
+    if not match:
+        return None, None
+    return int(match.group(1)), match.group(2)
+
+
+def _snapshot_date(seconds):
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds + SNAPSHOT_EPOCH_OFFSET, tz=timezone.utc).date().isoformat()
+
+
+def _read_legacy_history(filepath):
+    if not filepath.exists():
+        return []
+    with open(filepath, "r", encoding="utf-8") as f:
+        return list(dict.fromkeys(filter(None, f.read().splitlines())))
+
+
+def _upsert_folder(conn, folder, **fields):
+    version, folder_date = parse_folder_name(folder)
+    conn.execute("INSERT OR IGNORE INTO snapshots (folder, version, snapshot_date) VALUES (?, ?, ?)",
+                 (folder, version, folder_date))
+    if fields:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn.execute(f"UPDATE snapshots SET {assignments} WHERE folder = ?", (*fields.values(), folder))
+
+
+def connect(catalog_path=CATALOG_PATH):
+    """
+    Opens the catalog, creating it on first use. A new catalog takes its load order from
+    the legacy `.history_event.log` (newest first), so the diff dropdown keeps its entries.
+    """
+    catalog_path = Path(catalog_path)
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(catalog_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with conn:
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version == CATALOG_SCHEMA_VERSION:
+            return conn
+        loaded = []
+        if schema_version:
+            loaded = [row["folder"] for row in conn.execute(
+                "SELECT folder FROM snapshots WHERE loaded_at IS NOT NULL ORDER BY loaded_at DESC")]
+            conn.execute("DROP TABLE IF EXISTS snapshots")
+        else:
+            loaded = _read_legacy_history(LEGACY_HISTORY_FILE)
+        conn.executescript(_SCHEMA)
+        now = time.time()
+        for rank, folder in enumerate(loaded):
+            _upsert_folder(conn, folder, loaded_at=now - rank)
+        conn.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+    return conn
+
+
+def scan_snapshots(base_dir=EVENT_BASE_DIR, catalog_path=CATALOG_PATH):
+    """
+    Brings the catalog in line with the snapshot folders in `base_dir`: new folders are added,
+    folders whose CSV changed size or mtime lose their indexed metadata, and folders that are
+    gone are marked not present. Returns the folder names present, sorted.
+    """
+    base_dir = Path(base_dir)
+    try:
+        with os.scandir(base_dir) as entries:
+            folders = sorted(entry.name for entry in entries
+                             if entry.is_dir() and SNAPSHOT_FOLDER_PATTERN.match(entry.name))
+    except FileNotFoundError:
+        folders = []
+
+    now = time.time()
+    with closing(connect(catalog_path)) as conn, conn:
+        known = {row["folder"]: row for row in conn.execute("SELECT folder, size, mtime_ns, present FROM snapshots")}
+        for folder in folders:
+            csv_path = snapshot_csv_path(folder, base_dir)
+            try:
+                stat = csv_path.stat()
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            except FileNotFoundError:
+                size = mtime_ns = None
+            row = known.get(folder)
+            if row is not None and row["present"] and (row["size"], row["mtime_ns"]) == (size, mtime_ns):
+                continue
+            _upsert_folder(conn, folder, path=str(csv_path), present=1, size=size, mtime_ns=mtime_ns,
+                           sha1=None, rows=None, min_start_date=None, max_start_date=None, scanned_at=now)
+        present = set(folders)
+        for folder, row in known.items():
+            if row["present"] and folder not in present:
+                conn.execute("UPDATE snapshots SET present = 0, scanned_at = ? WHERE folder = ?", (now, folder))
+    return folders
+
+
+def index_snapshot(folder, base_dir=None, catalog_path=CATALOG_PATH, cache_dir=SNAPSHOT_CACHE_DIR):
+    """
+    Records the content metadata of one snapshot (hash, row count, startDate range, cache files),
+    ingesting it into the snapshot cache if needed. A snapshot whose CSV size and mtime match the
+    catalog entry is left as is. Returns the catalog entry as a dict, or None without a CSV.
+    """
+    csv_path = snapshot_csv_path(folder, base_dir)
+    try:
+        stat = csv_path.stat()
+    except FileNotFoundError:
+        return None
+    with closing(connect(catalog_path)) as conn, conn:
+        row = conn.execute("SELECT * FROM snapshots WHERE folder = ?", (folder,)).fetchone()
+        if (row is not None and row["sha1"] is not None
+                and (row["size"], row["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)):
+            return dict(row)
+
+    summary = snapshot_summary(csv_path, cache_dir)
+    data_path, meta_path = snapshot_cache_paths(csv_path, cache_dir)
+    with closing(connect(catalog_path)) as conn, conn:
+        _upsert_folder(conn, folder, path=str(csv_path), present=1, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                       sha1=summary["sha1"], rows=summary["rows"],
+                       min_start_date=_snapshot_date(summary["min_start"]),
+                       max_start_date=_snapshot_date(summary["max_start"]),
+                       cache_path=str(data_path) if data_path.exists() else None,
+                       cache_meta_path=str(meta_path) if meta_path.exists() else None,
+                       ingested_at=time.time())
+        return dict(conn.execute("SELECT * FROM snapshots WHERE folder = ?", (folder,)).fetchone())
+
+
+def mark_loaded(folder, catalog_path=CATALOG_PATH):
+    """Moves `folder` to the top of the load history (what save_to_history did with the log file)."""
+    if not folder:
+        return
+    with closing(connect(catalog_path)) as conn, conn:
+        _upsert_folder(conn, folder, loaded_at=time.time())
+
+
+def loaded_snapshots(catalog_path=CATALOG_PATH):
+    """Folders loaded in the app, most recent first."""
+    with closing(connect(catalog_path)) as conn:
+        return [row["folder"] for row in conn.execute(
+            "SELECT folder FROM snapshots WHERE loaded_at IS NOT NULL ORDER BY loaded_at DESC")]
+
+
+def snapshot_info(folder, catalog_path=CATALOG_PATH):
+    """The catalog entry of `folder` as a dict, or None."""
+    with closing(connect(catalog_path)) as conn:
+        row = conn.execute("SELECT * FROM snapshots WHERE folder = ?", (folder,)).fetchone()
+        return dict(row) if row is not None else None
+
+
+def previous_snapshot(folder, loaded_only=True, catalog_path=CATALOG_PATH):
+    """
+    The snapshot released before `folder` (by folder date, then version number), e.g. the natural
+    diff target for a new snapshot. Only loaded ones count unless `loaded_only` is False.
+    """
+    version, folder_date = parse_folder_name(folder)
+    if folder_date is None:
+        return None
+    loaded_filter = "AND loaded_at IS NOT NULL" if loaded_only else "AND present = 1"
+    with closing(connect(catalog_path)) as conn:
+        row = conn.execute(
+            f"SELECT folder FROM snapshots WHERE folder != ? {loaded_filter} "
+            "AND (snapshot_date < ? OR (snapshot_date = ? AND version < ?)) "
+            "ORDER BY snapshot_date DESC, version DESC LIMIT 1",
+            (folder, folder_date, folder_date, version)).fetchone()
+        return row["folder"] if row is not None else None
+
+
+def default_diff_folder(latest_folder, saved_diff_folder=None, catalog_path=CATALOG_PATH):
+    """
+    The diff target the main page preselects for `latest_folder`: `saved_diff_folder` (config.json's
+    diff_folder) if it is another loaded snapshot, else the loaded release before `latest_folder`, else
+    the most recently loaded snapshot. None when no other snapshot is loaded.
+    """
+    options = [folder for folder in loaded_snapshots(catalog_path) if folder != latest_folder]
+    if saved_diff_folder in options:
+        return saved_diff_folder
+    previous = previous_snapshot(latest_folder, catalog_path=catalog_path)
+    if previous in options:
+        return previous
+    return options[0] if options else None
+
+
+def release_history(until=None, loaded_only=True, catalog_path=CATALOG_PATH):
+    """
+    Snapshot folders in release order (folder date, then version number), oldest first, up to and
+    including `until`. Only loaded ones count unless `loaded_only` is False.
+    """
+    conditions = ["snapshot_date IS NOT NULL", "loaded_at IS NOT NULL" if loaded_only else "present = 1"]
+    params = []
+    version, folder_date = parse_folder_name(until)
+    if folder_date is not None:
+        conditions.append("(snapshot_date < ? OR (snapshot_date = ? AND version <= ?))")
+        params = [folder_date, folder_date, version]
+    with closing(connect(catalog_path)) as conn:
+        return [row["folder"] for row in conn.execute(
+            f"SELECT folder FROM snapshots WHERE {' AND '.join(conditions)} ORDER BY snapshot_date, version",
+            params)]
@@ -0,0 +1,179 @@
+# modules/snapshot_watcher.py
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from modules.data_loader import EVENT_BASE_DIR, refresh_hero_master, snapshot_csv_path
+from modules.event_store import EVENT_STORE_PATH, store_snapshot
+from modules.frame_registry import registry
+from modules.pipeline import build_comparison, comparison_cache_key, load_window
+from modules.snapshot_catalog import (CATALOG_PATH, default_diff_folder, index_snapshot, loaded_snapshots,
+                                      parse_folder_name, scan_snapshots)
+
+# --- Configuration ---
+CONFIG_FILE = Path("data") / "config.json"
+WATCH_POLL_SECONDS = 30
+
+
+def _load_config(filepath):
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+
+class SnapshotWatcher:
+    """
+    Polls EVENT_BASE_DIR for new `V<version>R-YYYY-MM-DD` snapshot folders and warms them in the
+    background: the CSV is ingested into the snapshot cache, indexed in the snapshot catalog and written to the
+    event store, then the comparison the main page would open for it (the diff folder it preselects, see
+    default_diff_folder, and the load window of config.json) is built and kept in the result cache and the frame
+    registry, so the first "Load Data" of a new version is a cache hit.
+
+    Polling only lists the base directory when its mtime moved (a folder was added or removed),
+    and a CSV is only picked up once its size and mtime are the same on two consecutive polls,
+    so files still being written by the extractor are left alone.
+
+    A folder counts as new when it was never loaded and is dated after the newest loaded snapshot.
+    Folders picked on the main page are written to the event store here too (store_in_background),
+    so "Load Data" never waits for it.
+    """
+
+    def __init__(self, base_dir=EVENT_BASE_DIR, catalog_path=CATALOG_PATH, config_file=CONFIG_FILE,
+                 poll_seconds=WATCH_POLL_SECONDS, event_store_path=EVENT_STORE_PATH):
+        self.base_dir = Path(base_dir)
+        self.catalog_path = Path(catalog_path)
+        self.event_store_path = Path(event_store_path)
+        self.config_file = Path(config_file)
+        self.poll_seconds = poll_seconds
+        self._folders = []
+        self._base_mtime = None
+        self._pending = {}   # folder -> (size, mtime_ns) seen on the previous poll
+        self._status = {}    # folder -> status dict
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()  # one event store writer at a time
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        """Status per detected folder, newest first: folder, state, diff_against, rows, seconds, error, updated."""
+        with self._lock:
+            return sorted((dict(entry) for entry in self._status.values()),
+                          key=lambda entry: entry['folder'], reverse=True)
+
+    def store_in_background(self, folders):
+        """
+        Writes `folders` to the event store on a background thread and returns the thread. Until a
+        folder is stored, build_comparison diffs the loaded frames in memory instead.
+        """
+        thread = threading.Thread(target=self._store, args=([folder for folder in folders if folder],),
+                                  name="snapshot-store", daemon=True)
+        thread.start()
+        return thread
+
+    def _store(self, folders):
+        with self._store_lock:
+            for folder in folders:
+                try:
+                    store_snapshot(folder, self.base_dir, self.event_store_path)
+                except Exception as e:
+                    print(f"Warning: could not store snapshot {folder}: {e}")
+
+    def _set_status(self, folder, **fields):
+        with self._lock:
+            entry = self._status.setdefault(folder, {'folder': folder, 'state': None, 'diff_against': None,
+                                                     'rows': None, 'seconds': None, 'error': None})
+            entry.update(fields, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Snapshot watcher poll failed: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def _list_folders(self):
+        try:
+            base_mtime = self.base_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if base_mtime != self._base_mtime:
+            self._folders = scan_snapshots(self.base_dir, self.catalog_path)
+            self._base_mtime = base_mtime
+        return self._folders
+
+    def poll(self):
+        """One scan: picks up new folders whose CSV is complete and warms them. Returns the folders warmed."""
+        history = loaded_snapshots(self.catalog_path)
+        newest_known = max((d for _, d in map(parse_folder_name, history) if d), default="")
+        with self._lock:
+            done = {folder for folder, entry in self._status.items() if entry['state'] in ('ready', 'failed')}
+        candidates = [folder for folder in self._list_folders()
+                      if folder not in history and parse_folder_name(folder)[1] > newest_known and folder not in done]
+
+        warmed = []
+        for folder in candidates:
+            csv_path = snapshot_csv_path(folder, self.base_dir)
+            try:
+                stat = csv_path.stat()
+            except FileNotFoundError:
+                self._set_status(folder, state='waiting for CSV')
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._pending.get(folder) != signature:
+                # Still being written, or seen for the first time; check again next poll
+                self._pending[folder] = signature
+                self._set_status(folder, state='waiting for CSV')
+                continue
+            self._pending.pop(folder, None)
+            config = _load_config(self.config_file)
+            self._warm(folder, default_diff_folder(folder, config.get('diff_folder'), self.catalog_path), config)
+            warmed.append(folder)
+        return warmed
+
+    def _warm(self, folder, diff_folder, config):
+        started = time.perf_counter()
+        try:
+            self._set_status(folder, state='ingesting', diff_against=diff_folder, error=None)
+            rows = index_snapshot(folder, self.base_dir, self.catalog_path)["rows"]
+            with self._store_lock:
+                store_snapshot(folder, self.base_dir, self.event_store_path)
+            self._set_status(folder, state='diffing' if diff_folder else 'ready', rows=rows)
+            if diff_folder:
+                # Off the UI thread, so the Drive check happens here rather than on a rerun
+                refresh_hero_master()
+                window_start, window_end = load_window(config)
+                cache_key = comparison_cache_key(folder, diff_folder, window_start, window_end, self.base_dir)
+                registry.get(('comparison', cache_key),
+                             lambda: build_comparison(cache_key, folder, diff_folder, window_start, window_end,
+                                                      self.base_dir, self.event_store_path))
+            self._set_status(folder, state='ready', seconds=round(time.perf_counter() - started, 2))
+        except Exception as e:
+            self._set_status(folder, state='failed', error=str(e), seconds=round(time.perf_counter() - started, 2))
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def ensure_watcher_started(**kwargs):
+    """The process-wide watcher (one per Streamlit server), started on first use."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = SnapshotWatcher(**kwargs)
+        return _watcher.start()
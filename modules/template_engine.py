@@ -0,0 +1,136 @@
+# modules/template_engine.py
+
+import hashlib
+import json
+
+import pandas as pd
+
+_compiled_template_cache = {}
+_compiled_json_template_cache = {}
+
+
+class CompiledTemplate:
+    """
+    A `{key}` template parsed once into literal and placeholder segments.
+
+    Parsing follows the post creators' rules: `\\x` emits `x` literally (a trailing `\\` is kept),
+    `{key}` runs to the next `}` and is replaced by the value for `key` ("" for NaN), a key that is
+    missing or None stays as literal `{key}`, and a `{` without a closing `}` is literal.
+    """
+
+    def __init__(self, template_str):
+        self.segments = []  # (is_placeholder, text)
+        literal = []
+        i = 0
+        n = len(template_str)
+        while i < n:
+            # Copy plain runs in one slice instead of one character at a time
+            next_special = min((pos for pos in (template_str.find("\\", i), template_str.find("{", i)) if pos != -1),
+                               default=n)
+            if next_special > i:
+                literal.append(template_str[i:next_special])
+                i = next_special
+                continue
+            char = template_str[i]
+            if char == "\\":
+                if i + 1 < n:
+                    literal.append(template_str[i + 1])
+                    i += 2
+                else:
+                    literal.append(char)
+                    i += 1
+            else:
+                end_brace = template_str.find("}", i)
+                if end_brace == -1:
+                    literal.append(char)
+                    i += 1
+                    continue
+                if literal:
+                    self.segments.append((False, "".join(literal)))
+                    literal = []
+                self.segments.append((True, template_str[i + 1:end_brace]))
+                i = end_brace + 1
+        if literal:
+            self.segments.append((False, "".join(literal)))
+        self.keys = [text for is_placeholder, text in self.segments if is_placeholder]
+        self.is_literal = not self.keys and "".join(text for _, text in self.segments) == template_str
+
+    def render(self, data_dict):
+        parts = []
+        for is_placeholder, text in self.segments:
+            if not is_placeholder:
+                parts.append(text)
+                continue
+            value = data_dict.get(text)
+            if value is not None:
+                # Lists (e.g. _changed_columns) are printed as is; pd.notna would test them element-wise
+                parts.append(str(value) if not pd.api.types.is_scalar(value) or pd.notna(value) else "")
+            else:
+                # If key not found, keep literal text
+                parts.append(f"{{{text}}}")
+        return "".join(parts)
+
+
+def compile_template(template_str):
+    """Returns the CompiledTemplate for `template_str`, parsing each distinct template only once."""
+    key = hashlib.sha1(template_str.encode("utf-8")).hexdigest()
+    compiled = _compiled_template_cache.get(key)
+    if compiled is None:
+        compiled = _compiled_template_cache[key] = CompiledTemplate(template_str)
+    return compiled
+
+
+def render_template(template_str, data_dict):
+    return compile_template(template_str).render(data_dict)
+
+
+class CompiledJsonTemplate:
+    """
+    A JSON template (Discord/Discohook payload) with the paths to its string leaves precomputed.
+
+    Only strings that change when rendered (placeholders or escapes) are visited; the containers on
+    the way to them are shallow-copied and every other subtree is shared with the template as is,
+    so rendered results must be treated as read-only.
+    """
+
+    def __init__(self, template_obj):
+        self.template = template_obj
+        self.plan = self._plan(template_obj)
+
+    @classmethod
+    def _plan(cls, node):
+        """CompiledTemplate for a changing string, [(key, plan), ...] for a container with one inside, else None."""
+        if isinstance(node, str):
+            compiled = compile_template(node)
+            return None if compiled.is_literal else compiled
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            return None
+        children = [(key, plan) for key, plan in ((key, cls._plan(value)) for key, value in items) if plan is not None]
+        return children or None
+
+    @staticmethod
+    def _render_node(node, plan, data_dict):
+        if isinstance(plan, CompiledTemplate):
+            return plan.render(data_dict)
+        result = dict(node) if isinstance(node, dict) else list(node)
+        for key, child_plan in plan:
+            result[key] = CompiledJsonTemplate._render_node(node[key], child_plan, data_dict)
+        return result
+
+    def render(self, data_dict):
+        if self.plan is None:
+            return self.template
+        return self._render_node(self.template, self.plan, data_dict)
+
+
+def compile_json_template(template_obj):
+    """Returns the CompiledJsonTemplate for `template_obj`, cached by the template's JSON content."""
+    key = hashlib.sha1(json.dumps(template_obj, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+    compiled = _compiled_json_template_cache.get(key)
+    if compiled is None:
+        compiled = _compiled_json_template_cache[key] = CompiledJsonTemplate(template_obj)
+    return compiled
@@ -0,0 +1,190 @@
+# modules/timeline.py
+
+"""
+Event lineage across an ordered list of snapshots (oldest first).
+
+Consecutive snapshots are diffed pairwise with compare_dataframes, and every row of every diff is
+assigned a lineage: matched and modified rows keep the lineage of their diff_id, shifted rows that of
+the previous snapshot's row with the same unique_id (the shifted-event stage's pairing), and anything
+else starts a new one. Each non-unchanged row is kept as a transition, so an event's history is its
+lineage's transitions in snapshot order.
+
+Timelines are stored in the result cache under the content hashes of their snapshots. Extending a
+cached timeline by one snapshot costs one pairwise diff.
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.data_loader import snapshot_csv_path
+from modules.diff_engine import (DIFF_ENGINE_VERSION, HERO_COLS_C, HERO_COLS_H, compare_dataframes, has_changed,
+                                 with_diff_status)
+from modules.diff_spec import load_diff_spec
+from modules.event_store import compare_snapshots, is_stored
+from modules.result_cache import load_cached_result, result_cache_key, store_cached_result
+from modules.snapshot_cache import read_snapshot, snapshot_hash
+
+# Bump when the timeline layout changes; cached timelines are then rebuilt
+TIMELINE_VERSION = 1
+
+TRANSITION_COLUMNS = (['lineage_id', 'step', 'folder', '_diff_status', '_changed_columns',
+                       'diff_id', 'unique_id', 'event', 'type', 'startDate', 'endDate', 'original_startDate']
+                      + HERO_COLS_H + HERO_COLS_C)
+
+
+def _timeline_key(folders, hashes):
+    return result_cache_key('timeline', TIMELINE_VERSION, DIFF_ENGINE_VERSION, load_diff_spec().key,
+                            list(folders), list(hashes))
+
+
+def timeline_key(folders, base_dir=None):
+    """Result cache key of the timeline of `folders`: it changes when a CSV is re-exported into one of them."""
+    return _timeline_key(folders, [snapshot_hash(snapshot_csv_path(folder, base_dir)) for folder in folders])
+
+
+def _match_keys(df):
+    """unique_id as the shifted-event stage compares it (stripped string), NaN where missing."""
+    unique_ids = df['unique_id'] if 'unique_id' in df.columns else pd.Series(np.nan, index=df.index)
+    return unique_ids.where(unique_ids.isna(), unique_ids.astype(str).str.strip())
+
+
+def _lookup(keys, lineage, valid):
+    """Series keys -> lineage id of the last row carrying that key, for the rows in `valid`."""
+    keys = keys[valid & keys.notna().to_numpy()]
+    lookup = pd.Series(lineage[keys.index.to_numpy()], index=keys.to_numpy())
+    return lookup[~lookup.index.duplicated(keep='last')]
+
+
+def _transitions(diff_df, lineage, mask, step, folder):
+    transitions = diff_df[mask].assign(lineage_id=lineage[mask], step=step, folder=folder)
+    return transitions[[col for col in TRANSITION_COLUMNS if col in transitions.columns]]
+
+
+def _pair_diff(current_folder, previous_folder, base_dir=None):
+    """compare_dataframes of two whole snapshots, through the event store when both are stored."""
+    if is_stored(current_folder, base_dir) and is_stored(previous_folder, base_dir):
+        return compare_snapshots(current_folder, previous_folder)
+    return compare_dataframes(read_snapshot(snapshot_csv_path(current_folder, base_dir), fingerprints=True),
+                              read_snapshot(snapshot_csv_path(previous_folder, base_dir), fingerprints=True))
+
+
+def start_timeline(folder, base_dir=None):
+    """A timeline of one snapshot: every row is a 'new' transition with a lineage of its own."""
+    csv_path = snapshot_csv_path(folder, base_dir)
+    df = read_snapshot(csv_path).reset_index(drop=True)
+    df = with_diff_status(df.assign(original_startDate=np.nan), 'new')
+
+    lineage = np.arange(len(df), dtype='int64')
+    present = np.ones(len(df), dtype=bool)
+    return {
+        'folders': [folder],
+        'hashes': [snapshot_hash(csv_path)],
+        'transitions': _transitions(df, lineage, present, 0, folder).reset_index(drop=True),
+        'lineage_by_diff_id': _lookup(df['diff_id'], lineage, present),
+        'lineage_by_unique_id': _lookup(_match_keys(df), lineage, present),
+        'lineage_count': len(df),
+    }
+
+
+def extend_timeline(timeline, folder, base_dir=None, diff_df=None):
+    """
+    The timeline with one more snapshot appended, from a single diff of `folder` against the
+    timeline's last snapshot (`diff_df`, if that comparison is already at hand). The input is not modified.
+    """
+    if diff_df is None:
+        diff_df = _pair_diff(folder, timeline['folders'][-1], base_dir)
+    diff_df = diff_df.reset_index(drop=True)
+    step = len(timeline['folders'])
+    status = diff_df['_diff_status'].to_numpy()
+    shifted = status == 'shifted'
+
+    # Shifted rows carry a new diff_id; their predecessor is the previous snapshot's row with their unique_id
+    match_keys = _match_keys(diff_df)
+    by_diff_id = diff_df['diff_id'].map(timeline['lineage_by_diff_id'])
+    by_unique_id = match_keys.map(timeline['lineage_by_unique_id'])
+    lineage = by_unique_id.where(shifted, by_diff_id).fillna(by_diff_id).to_numpy(dtype='float64')
+
+    missing = np.isnan(lineage)
+    lineage_count = timeline['lineage_count'] + int(missing.sum())
+    lineage[missing] = np.arange(timeline['lineage_count'], lineage_count)
+    lineage = lineage.astype('int64')
+
+    present = status != 'deleted'
+    new_by_diff_id = _lookup(diff_df['diff_id'], lineage, present)
+    lineage_by_diff_id = pd.concat([timeline['lineage_by_diff_id'], new_by_diff_id])
+    # diff_ids seen earlier keep mapping to their lineage, so an event that comes back rejoins it
+    lineage_by_diff_id = lineage_by_diff_id[~lineage_by_diff_id.index.duplicated(keep='last')]
+
+    transitions = _transitions(diff_df, lineage, status != 'unchanged', step, folder)
+    return {
+        'folders': timeline['folders'] + [folder],
+        'hashes': timeline['hashes'] + [snapshot_hash(snapshot_csv_path(folder, base_dir))],
+        'transitions': pd.concat([timeline['transitions'], transitions], ignore_index=True),
+        'lineage_by_diff_id': lineage_by_diff_id,
+        'lineage_by_unique_id': _lookup(match_keys, lineage, present),
+        'lineage_count': lineage_count,
+    }
+
+
+def build_timeline(folders, base_dir=None):
+    """
+    The timeline of `folders` (oldest first). The longest prefix found in the result cache is
+    extended one snapshot at a time, and the result is stored for the next call.
+    """
+    folders = list(folders)
+    if not folders:
+        raise ValueError("build_timeline needs at least one snapshot folder")
+    hashes = [snapshot_hash(snapshot_csv_path(folder, base_dir)) for folder in folders]
+
+    timeline = None
+    for length in range(len(folders), 0, -1):
+        timeline = load_cached_result(_timeline_key(folders[:length], hashes[:length]))
+        if timeline is not None:
+            break
+    if timeline is not None and len(timeline['folders']) == len(folders):
+        return timeline
+
+    if timeline is None:
+        timeline = start_timeline(folders[0], base_dir)
+    for folder in folders[len(timeline['folders']):]:
+        timeline = extend_timeline(timeline, folder, base_dir)
+    store_cached_result(_timeline_key(folders, hashes), timeline)
+    return timeline
+
+
+def event_lineage(timeline, diff_id=None, unique_id=None):
+    """
+    Transitions of the event(s) with this diff_id and/or unique_id in any snapshot, in snapshot order.
+    Each row is one version where the event appeared, changed, moved or disappeared.
+    """
+    transitions = timeline['transitions']
+    mask = np.zeros(len(transitions), dtype=bool)
+    if diff_id is not None:
+        mask |= (transitions['diff_id'] == str(diff_id)).to_numpy()
+    if unique_id is not None:
+        mask |= (_match_keys(transitions) == str(unique_id).strip()).to_numpy()
+    lineage_ids = transitions.loc[mask, 'lineage_id'].unique()
+    history = transitions[transitions['lineage_id'].isin(lineage_ids)]
+    return history.sort_values(['lineage_id', 'step'], kind='stable')
+
+
+def lineage_summary(timeline):
+    """
+    One row per lineage: first and last snapshot it changed in, last status, and how many versions
+    changed its status and each group of the diff spec.
+    """
+    spec = load_diff_spec()
+    transitions = timeline['transitions']
+    grouped = transitions.groupby('lineage_id', sort=True)
+    summary = pd.DataFrame({
+        'unique_id': grouped['unique_id'].last(),
+        'event': grouped['event'].last() if 'event' in transitions.columns else None,
+        'first_folder': grouped['folder'].first(),
+        'last_folder': grouped['folder'].last(),
+        'last_status': grouped['_diff_status'].last(),
+        'changes': grouped['_diff_status'].size() - 1,
+    })
+    for group in spec.names:
+        flags = pd.Series(has_changed(transitions['_changed_columns'], group, spec), index=transitions.index)
+        summary[f'{group}_changes'] = flags.groupby(transitions['lineage_id']).sum().astype('int64')
+    return summary
@@ -4,7 +4,9 @@ import json
 import re
 from pathlib import Path
 from datetime import date
-from modules.display_formatter import format_dataframe_for_display, to_html_table
+from modules.display_formatter import format_dataframe_for_display, filter_by_start_date, to_html_table
+from modules.frame_registry import registry
+from modules.template_engine import render_template
 
 # --- Config and CSS Helper Functions ---
 DATA_DIR = Path("data")
@@ -27,35 +29,7 @@ def inject_custom_css():
 
 # --- Custom Template Processor ---
 def process_custom_template(template_str, data_dict):
-    output = ""
-    i = 0
-    while i < len(template_str):
-        char = template_str[i]
-        if char == '\\':  # Escape character
-            if i + 1 < len(template_str):
-                output += template_str[i+1]
-                i += 2
-            else:  # Dangling escape char
-                output += char
-                i += 1
-        elif char == '{':
-            end_brace = template_str.find('}', i)
-            if end_brace != -1:
-                key = template_str[i+1:end_brace]
-                value = data_dict.get(key)
-                if value is not None:
-                    output += str(value) if pd.notna(value) else ""
-                else:
-                    # If key not found, treat it as literal text
-                    output += f"{{{key}}}"
-                i = end_brace + 1
-            else:  # Unmatched opening brace
-                output += char
-                i += 1
-        else:
-            output += char
-            i += 1
-    return output
+    return render_template(template_str, data_dict)
 
 st.set_page_config(layout="wide", page_title="Forum Post Creator")
 inject_custom_css()
@@ -84,15 +58,25 @@ def load_template():
         
     return templates
 
-if 'diff_data' not in st.session_state or st.session_state['diff_data'].empty:
+# The main page registers its comparison result in the shared registry; read it from there
+# instead of keeping a per-session copy of the diff frame
+shared_result = registry.get(st.session_state['comparison_key']) if 'comparison_key' in st.session_state else None
+if shared_result is not None:
+    comparison_df, en_map, ja_map = shared_result
+    diff_df_raw = comparison_df[comparison_df['_diff_status'] != 'unchanged']
+elif 'diff_data' in st.session_state:
+    diff_df_raw = st.session_state['diff_data']
+    en_map = st.session_state['en_map']
+    ja_map = st.session_state['ja_map']
+else:
+    diff_df_raw = None
+
+if diff_df_raw is None or diff_df_raw.empty:
     st.warning("No difference data found. Please generate it from the main page.")
     st.page_link("app.py", label="Back to Main Page", icon="🏠")
     st.stop()
 
 config = load_json_file(CONFIG_FILE)
-diff_df_raw = st.session_state['diff_data']
-en_map = st.session_state['en_map']
-ja_map = st.session_state['ja_map']
 template = load_template()
 
 # --- Format Data ---
@@ -156,9 +140,7 @@ if not display_df_all_cols.empty:
     if config_changed:
         save_json_file(CONFIG_FILE, config)
 
-    mask = ((display_df_all_cols['Start Time'].dt.date >= start_date_filter) &
-           (display_df_all_cols['Start Time'].dt.date <= end_date_filter))
-    filtered_display_df = display_df_all_cols[mask]
+    filtered_display_df = filter_by_start_date(display_df_all_cols, start_date_filter, end_date_filter)
 else:
     filtered_display_df = display_df_all_cols
 
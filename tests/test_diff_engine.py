@@ -0,0 +1,88 @@
+# tests/test_diff_engine.py
+
+"""
+The columnar diff (with and without row fingerprints) must match the row-wise reference, and the
+event store's compare_snapshots must match compare_dataframes.
+Run from the project root: python -m pytest
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules.data_loader import snapshot_csv_path
+from modules.diff_engine import (DEFAULT_DIFF_SPEC, FINGERPRINT_COLUMN, compare_dataframes, row_fingerprints,
+                                 synthetic_snapshots)
+from modules.event_store import compare_snapshots, store_snapshot
+from modules.snapshot_cache import apply_snapshot_schema, read_snapshot
+
+HERO_MASTER_PATH = Path(__file__).resolve().parent.parent / "data" / "hero_master.csv"
+
+
+@pytest.fixture(scope="module")
+def hero_ids():
+    """Hero IDs of the bundled hero master, so the snapshots carry real ID strings."""
+    return pd.read_csv(HERO_MASTER_PATH, usecols=['id'])['id'].dropna().astype(str).unique()
+
+
+def _diff_all_modes(current, previous):
+    results = {mode: compare_dataframes(current, previous, mode=mode, spec=DEFAULT_DIFF_SPEC)
+               for mode in ('rowwise', 'columnar')}
+    results['fingerprinted'] = compare_dataframes(
+        current.assign(**{FINGERPRINT_COLUMN: row_fingerprints(current, DEFAULT_DIFF_SPEC)}),
+        previous.assign(**{FINGERPRINT_COLUMN: row_fingerprints(previous, DEFAULT_DIFF_SPEC)}),
+        spec=DEFAULT_DIFF_SPEC)
+    return results
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("typed", [False, True], ids=["raw", "snapshot_schema"])
+def test_columnar_matches_rowwise(hero_ids, seed, typed):
+    current, previous = synthetic_snapshots(1_000, seed=seed, hero_ids=hero_ids)
+    if typed:
+        # As read from the snapshot cache: integer dates, categorical hero columns
+        current, previous = apply_snapshot_schema(current), apply_snapshot_schema(previous)
+    results = _diff_all_modes(current, previous)
+
+    statuses = set(results['rowwise']['_diff_status'].astype(str))
+    assert {'unchanged', 'new', 'deleted', 'modified', 'shifted'} <= statuses
+    assert FINGERPRINT_COLUMN not in results['fingerprinted'].columns
+    for mode in ('columnar', 'fingerprinted'):
+        pd.testing.assert_frame_equal(results['rowwise'], results[mode], check_dtype=False)
+
+
+def test_inputs_are_not_modified(hero_ids):
+    current, previous = synthetic_snapshots(200, hero_ids=hero_ids)
+    current_before, previous_before = current.copy(), previous.copy()
+    _diff_all_modes(current, previous)
+    pd.testing.assert_frame_equal(current, current_before)
+    pd.testing.assert_frame_equal(previous, previous_before)
+
+
+def _in_stable_order(df):
+    """`df` in an order independent of how rows with the same start time were tied."""
+    return df.sort_values(['startDate', 'diff_id', 'unique_id', '_diff_status'], kind='stable').reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("date_window", [None, (810_000_000, 820_000_000)], ids=["whole", "windowed"])
+def test_event_store_matches_compare_dataframes(tmp_path, hero_ids, seed, date_window):
+    current, previous = synthetic_snapshots(3_000, seed=seed, hero_ids=hero_ids)
+    store_path, cache_dir = tmp_path / "event_store.sqlite", tmp_path / "snapshot_cache"
+    snapshots = {'V7900R-2025-09-15': current, 'V7800R-2025-09-01': previous}
+    for folder, df in snapshots.items():
+        csv_path = snapshot_csv_path(folder, tmp_path)
+        csv_path.parent.mkdir()
+        df.to_csv(csv_path, index=False)
+        store_snapshot(folder, tmp_path, store_path, cache_dir)
+    current_folder, previous_folder = snapshots
+
+    # What build_comparison does when the snapshots are not stored yet
+    expected = compare_dataframes(
+        *(read_snapshot(snapshot_csv_path(folder, tmp_path), cache_dir, date_window=date_window, fingerprints=True)
+          for folder in (current_folder, previous_folder)))
+    stored = compare_snapshots(current_folder, previous_folder, date_window=date_window, store_path=store_path)
+
+    assert {'unchanged', 'new', 'deleted', 'modified', 'shifted'} <= set(expected['_diff_status'].astype(str))
+    pd.testing.assert_frame_equal(_in_stable_order(expected), _in_stable_order(stored), check_like=True)
@@ -0,0 +1,36 @@
+# tests/test_post_templates.py
+
+"""
+Forum and Discord templates print `{_changed_columns}` as the list of changed groups, not the bitmask.
+Run from the project root: python -m pytest
+"""
+
+import pytest
+
+from modules.diff_spec import load_diff_spec
+from modules.discord_post_creator import event_template_data
+from modules.forum_post_creator import render_forum_texts
+from modules.template_engine import compile_json_template
+
+FORUM_TEMPLATES = {'modified_en': "Changed: {_changed_columns}", 'modified_ja': "変更: {_changed_columns}"}
+
+
+def _changed_row(group_names):
+    spec = load_diff_spec()
+    return {'_diff_status': 'modified', '_changed_columns': sum(spec.flags[name] for name in group_names)}
+
+
+@pytest.mark.parametrize("n_groups", [0, 1, 2])
+def test_forum_template_prints_group_names(n_groups):
+    group_names = load_diff_spec().names[:n_groups]
+    en_text, ja_text = render_forum_texts(_changed_row(group_names), FORUM_TEMPLATES)
+    assert en_text == f"Changed: {group_names}"
+    assert ja_text == f"変更: {group_names}"
+
+
+@pytest.mark.parametrize("n_groups", [0, 1, 2])
+def test_discord_template_prints_group_names(n_groups):
+    group_names = load_diff_spec().names[:n_groups]
+    event_data = event_template_data(_changed_row(group_names), {})
+    payload = compile_json_template({"content": "{_changed_columns}"}).render(event_data)
+    assert payload == {"content": str(group_names)}